@@ -0,0 +1,48 @@
+"""Query Classifier: cheap pre-planner triage of incoming queries.
+
+Runs before the Planning Agent without any model call. Small talk
+("hi", "thanks") needs neither retrieval nor a plan and goes straight to
+the responder; a short single-question query becomes a one-task plan, so
+the planner's LLM round trip is skipped. Anything else — multi-part,
+comparative or long queries — is left to the planner.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Literal
+
+from app.core.config import settings
+
+Route = Literal["direct", "single", "plan"]
+
+# Greetings, thanks and acknowledgements (English and Portuguese)
+_SMALL_TALK = re.compile(
+    r"^(hi|hello|hey|good (morning|afternoon|evening)|thanks|thank you|thx|ok|okay|cool|great|bye|goodbye"
+    r"|oi|ol[aá]|e a[ií]|bom dia|boa tarde|boa noite|obrigad[oa]|valeu|beleza|tchau|at[eé] logo)"
+    r"( (there|you|so much|a lot|muito))?[\s!.,?]*$",
+    re.IGNORECASE,
+)
+
+# Signals that a query has several parts the planner should split
+_MULTI_PART = re.compile(
+    r"\b(and|then|also|versus|vs|compare|comparing|difference|between|step[s]?"
+    r"|e|depois|tamb[eé]m|compar\w*|diferen[cç]a|entre|passos?)\b|[;\n]|^\s*\d+[.)]",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def classify_query(query: str) -> Route:
+    """Pick the cheapest route that can answer `query`."""
+    text = query.strip()
+    if _SMALL_TALK.match(text):
+        return "direct"
+
+    if (
+        len(text.split()) <= settings.PLANNER_FAST_PATH_MAX_WORDS
+        and text.count("?") <= 1
+        and not _MULTI_PART.search(text)
+    ):
+        return "single"
+
+    return "plan"
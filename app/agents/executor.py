@@ -8,10 +8,11 @@ from __future__ import annotations
 
 import json
 
-from langchain_openai import ChatOpenAI
-
 from app.core.config import settings
-from app.core.state import AgentState
+from app.core.context import pack_context
+from app.core.llm import get_llm
+from app.core.scheduler import ainvoke_llm
+from app.core.state import TaskState
 
 
 EXECUTOR_SYSTEM = """You are an execution agent in an enterprise multi-agent system.
@@ -30,21 +31,25 @@ If you cannot complete the task:
 """
 
 
-def executor_node(state: AgentState) -> dict:
+async def executor_node(state: TaskState) -> dict:
     """LangGraph node: executes the current sub-task using context."""
 
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        api_key=settings.OPENAI_API_KEY,
-        temperature=0.2,
-    )
+    llm = get_llm("executor", temperature=0.2)
 
-    plan = state.get("plan", [])
-    idx = state.get("current_task_index", 0)
-    task = plan[idx] if idx < len(plan) else {"description": state["query"], "tool": "general"}
-    context = state.get("context_documents", [])
+    task = state.get("task") or {"description": state["query"], "tool": "general"}
+    context_block = pack_context(
+        state.get("context_documents", []),
+        target=task["description"],
+        budget=settings.CONTEXT_BUDGET_EXECUTOR,
+        model=llm.model_name,
+        task_id=task.get("id"),
+    ) or "No context available."
 
-    context_block = "\n---\n".join(context[:5]) if context else "No context available."
+    prior_block = ""
+    if state.get("prior_results"):
+        prior_block = "\n\nResults of prerequisite sub-tasks:\n" + "\n".join(
+            f"- Task {r['task_id']}: {str(r['output'])[:800]}" for r in state["prior_results"]
+        )
 
     messages = [
         {"role": "system", "content": EXECUTOR_SYSTEM},
@@ -54,11 +59,12 @@ def executor_node(state: AgentState) -> dict:
                 f"Sub-task: {task['description']}\n"
                 f"Tool hint: {task.get('tool', 'general')}\n\n"
                 f"Context:\n{context_block}"
+                f"{prior_block}"
             ),
         },
     ]
 
-    response = llm.invoke(messages)
+    response = await ainvoke_llm(llm, messages)
     raw = response.content.strip()
 
     if "```" in raw:
@@ -71,15 +77,11 @@ def executor_node(state: AgentState) -> dict:
     except json.JSONDecodeError:
         result = {"result": response.content.strip(), "status": "done"}
 
-    # Update the task status in the plan
-    updated_plan = list(plan)
-    if idx < len(updated_plan):
-        updated_plan[idx] = {**updated_plan[idx], "status": result.get("status", "done"), "result": result.get("result", "")}
-
-    next_idx = idx + 1
+    # Report only this sub-task; the plan reducer merges it by id
+    status = result.get("status") if result.get("status") in ("done", "failed") else "done"
+    updated_task = {**task, "status": status, "result": result.get("result", "")}
 
     return {
-        "plan": updated_plan,
-        "current_task_index": next_idx,
-        "tool_results": [{"task_id": task.get("id", idx), "output": result.get("result", "")}],
+        "plan": [updated_task],
+        "tool_results": [{"task_id": task.get("id", 0), "output": result.get("result", "")}],
     }
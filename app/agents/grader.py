@@ -0,0 +1,390 @@
+"""Relevance Grader: decides which retrieved documents are worth keeping.
+
+Used by the Search Agent after every retrieval hop. Knowledge base hits first
+go through a distance policy: close hits are accepted and far ones rejected
+without an LLM call; only the ambiguous band in between is sent to the model.
+The LLM grades all remaining candidates of a hop in one multi-document call;
+if that reply cannot be parsed, each document is graded on its own with a
+bounded number of concurrent calls.
+
+Runs started by the batch endpoint opt into shared grading: their grading
+requests are gathered over a short window and graded together in one call
+of query/document pairs, so concurrent batch items share LLM round trips.
+
+Every LLM verdict on a hit with a known distance is appended to a decision
+log, from which the policy thresholds can be recalibrated.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from langchain_openai import ChatOpenAI
+
+from app.core.config import settings
+from app.core.memo import memo_ainvoke
+
+logger = logging.getLogger(__name__)
+
+
+GRADER_SYSTEM = """You are a relevance grader. Given a user query and a document,
+respond with ONLY 'yes' or 'no' — is the document relevant to answering the query?"""
+
+BATCH_GRADER_SYSTEM = """You are a relevance grader. Given a user query and a numbered list of documents,
+decide for each document whether it is relevant to answering the query.
+
+Respond ONLY with a JSON array of booleans, one per document, in the same order.
+Example for three documents: [true, false, true]"""
+
+PAIRS_GRADER_SYSTEM = """You are a relevance grader. Given a numbered list of query/document pairs,
+decide for each pair whether the document is relevant to answering its query.
+
+Respond ONLY with a JSON array of booleans, one per pair, in the same order.
+Example for three pairs: [true, false, true]"""
+
+
+async def grade_document(llm: ChatOpenAI, query: str, doc: str) -> bool:
+    """Return True if the document is relevant to the query."""
+    reply = await memo_ainvoke(llm, [
+        {"role": "system", "content": GRADER_SYSTEM},
+        {"role": "user", "content": f"Query: {query}\n\nDocument: {doc[:1500]}"},
+    ])
+    return reply.strip().lower().startswith("yes")
+
+
+async def _grade_concurrently(llm: ChatOpenAI, query: str, docs: list[str]) -> list[bool]:
+    """Grade each document with its own call, at most GRADER_MAX_CONCURRENCY at once."""
+    semaphore = asyncio.Semaphore(settings.GRADER_MAX_CONCURRENCY)
+
+    async def _bounded(doc: str) -> bool:
+        async with semaphore:
+            return await grade_document(llm, query, doc)
+
+    return list(await asyncio.gather(*(_bounded(doc) for doc in docs)))
+
+
+def _parse_verdicts(reply: str, expected: int) -> list[bool] | None:
+    raw = reply.strip()
+
+    if "```" in raw:
+        raw = raw.split("```")[1]
+        if raw.startswith("json"):
+            raw = raw[4:]
+
+    try:
+        verdicts = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(verdicts, list) or len(verdicts) != expected:
+        return None
+
+    return [v is True or str(v).strip().lower() in ("yes", "true") for v in verdicts]
+
+
+async def _grade_batch(llm: ChatOpenAI, query: str, docs: list[str]) -> list[bool] | None:
+    """Grade all documents in a single call. Returns None if the reply is unusable."""
+    numbered = "\n\n".join(f"[{i}] {doc[:1500]}" for i, doc in enumerate(docs, start=1))
+
+    reply = await memo_ainvoke(llm, [
+        {"role": "system", "content": BATCH_GRADER_SYSTEM},
+        {"role": "user", "content": f"Query: {query}\n\nDocuments:\n{numbered}"},
+    ])
+    return _parse_verdicts(reply, len(docs))
+
+
+async def _grade_pairs(llm: ChatOpenAI, pairs: list[tuple[str, str]]) -> list[bool] | None:
+    """Grade query/document pairs of several queries in a single call. None if the reply is unusable."""
+    numbered = "\n\n".join(
+        f"[{i}] Query: {query}\nDocument: {doc[:1500]}" for i, (query, doc) in enumerate(pairs, start=1)
+    )
+
+    reply = await memo_ainvoke(llm, [
+        {"role": "system", "content": PAIRS_GRADER_SYSTEM},
+        {"role": "user", "content": f"Pairs:\n{numbered}"},
+    ])
+    return _parse_verdicts(reply, len(pairs))
+
+
+async def _grade_unshared(llm: ChatOpenAI, query: str, docs: list[str]) -> list[bool]:
+    """Grade the documents of one query: one call, or individually if that reply is unusable."""
+    if not docs:
+        return []
+
+    if len(docs) == 1:
+        return [await grade_document(llm, query, docs[0])]
+
+    if settings.GRADER_MODE == "batch":
+        verdicts = await _grade_batch(llm, query, docs)
+        if verdicts is not None:
+            return verdicts
+        logger.warning("Batch grading reply unusable; grading %d documents individually", len(docs))
+
+    return await _grade_concurrently(llm, query, docs)
+
+
+class SharedGradingBatcher:
+    """Gathers grading requests from concurrent runs into one pairs call.
+
+    A request waits at most `window_ms` for others to join; a batch is sent
+    early once it holds `max_docs` documents. A lone request is graded the
+    usual way, so its prompt (and memo entry) is the same as without sharing.
+    """
+
+    def __init__(self, window_ms: float, max_docs: int):
+        self.window = window_ms / 1000
+        self.max_docs = max_docs
+        self._pending: list[tuple[str, list[str], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._llm: ChatOpenAI | None = None
+        self._inflight: set[asyncio.Task] = set()
+        self.calls_saved = 0
+
+    async def grade(self, llm: ChatOpenAI, query: str, docs: list[str]) -> list[bool]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((query, docs, future))
+        self._llm = llm
+
+        if sum(len(d) for _, d, _ in self._pending) >= self.max_docs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        groups, self._pending = self._pending, []
+        if groups:
+            task = asyncio.ensure_future(self._grade_groups(self._llm, groups))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _grade_groups(self, llm: ChatOpenAI, groups: list[tuple[str, list[str], asyncio.Future]]) -> None:
+        try:
+            if len(groups) == 1:
+                query, docs, _ = groups[0]
+                results = [await _grade_unshared(llm, query, docs)]
+            else:
+                pairs = [(query, doc) for query, docs, _ in groups for doc in docs]
+                flat = await _grade_pairs(llm, pairs)
+                if flat is None:
+                    logger.warning("Shared grading reply unusable; grading %d queries separately", len(groups))
+                    results = list(await asyncio.gather(
+                        *(_grade_unshared(llm, query, docs) for query, docs, _ in groups)
+                    ))
+                else:
+                    self.calls_saved += len(groups) - 1
+                    results, offset = [], 0
+                    for _, docs, _ in groups:
+                        results.append(flat[offset:offset + len(docs)])
+                        offset += len(docs)
+        except Exception as exc:
+            for _, _, future in groups:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, _, future), verdicts in zip(groups, results):
+            if not future.done():
+                future.set_result(verdicts)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_docs": self.max_docs,
+            "calls_saved": self.calls_saved,
+        }
+
+
+shared_grader = SharedGradingBatcher(
+    window_ms=settings.GRADER_SHARED_WINDOW_MS,
+    max_docs=settings.GRADER_SHARED_MAX_DOCS,
+)
+
+_shared_grading: contextvars.ContextVar[bool] = contextvars.ContextVar("shared_grading", default=False)
+
+
+def enable_shared_grading() -> None:
+    """Let graph runs started from the current context share grading calls."""
+    _shared_grading.set(True)
+
+
+async def grade_documents(llm: ChatOpenAI, query: str, docs: list[str]) -> list[bool]:
+    """Return one relevance verdict per document, in order."""
+    if not docs:
+        return []
+
+    if settings.GRADER_MODE == "batch" and _shared_grading.get():
+        return await shared_grader.grade(llm, query, docs)
+
+    return await _grade_unshared(llm, query, docs)
+
+
+class GradingPolicy:
+    """Distance thresholds that settle KB relevance without the LLM.
+
+    distance < accept_below → relevant; distance > reject_above → irrelevant;
+    anything in between (or without a distance) is graded by the LLM.
+    """
+
+    def __init__(self, accept_below: float, reject_above: float,
+                 log_path: str, thresholds_path: str, audit_rate: float):
+        self.accept_below = accept_below
+        self.reject_above = reject_above
+        self.log_path = log_path
+        self.thresholds_path = thresholds_path
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self.counts = {"auto_accepted": 0, "auto_rejected": 0, "llm_graded": 0, "audited": 0}
+        self._load_thresholds()
+
+    def _load_thresholds(self) -> None:
+        path = Path(self.thresholds_path)
+        if not path.exists():
+            return
+        try:
+            saved = json.loads(path.read_text(encoding="utf-8"))
+            self.accept_below = float(saved["accept_below"])
+            self.reject_above = float(saved["reject_above"])
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Ignoring unreadable grading thresholds: %s", exc)
+
+    def decide(self, distance: float | None) -> bool | None:
+        """Return the automatic verdict, or None when the LLM must decide."""
+        if distance is None:
+            return None
+        if distance < self.accept_below:
+            verdict = True
+        elif distance > self.reject_above:
+            verdict = False
+        else:
+            return None
+
+        # Audit a sample of automatic decisions so the log stays unbiased
+        if random.random() < self.audit_rate:
+            self.counts["audited"] += 1
+            return None
+
+        self.counts["auto_accepted" if verdict else "auto_rejected"] += 1
+        return verdict
+
+    def log_decisions(self, query: str, distances: list[float], verdicts: list[bool]) -> None:
+        if not distances:
+            return
+        now = time.time()
+        lines = "".join(
+            json.dumps({"ts": now, "query": query[:200], "distance": d, "relevant": v}) + "\n"
+            for d, v in zip(distances, verdicts)
+        )
+        try:
+            with self._lock:
+                Path(self.log_path).parent.mkdir(parents=True, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as fh:
+                    fh.write(lines)
+        except OSError as exc:
+            logger.warning("Could not write grading decision log: %s", exc)
+
+    def calibrate(self, target_precision: float | None = None, min_samples: int | None = None) -> dict[str, Any]:
+        """Recompute thresholds from the decision log and persist them.
+
+        accept_below becomes the largest distance under which LLM verdicts were
+        relevant at least `target_precision` of the time; reject_above the
+        smallest distance above which they were irrelevant as often.
+        """
+        target = target_precision or settings.GRADER_CALIBRATION_PRECISION
+        min_samples = min_samples or settings.GRADER_CALIBRATION_MIN_SAMPLES
+
+        try:
+            with open(self.log_path, encoding="utf-8") as fh:
+                decisions = sorted(
+                    (rec["distance"], rec["relevant"]) for rec in map(json.loads, fh) if rec.get("distance") is not None
+                )
+        except FileNotFoundError:
+            decisions = []
+
+        result: dict[str, Any] = {"samples": len(decisions), "updated": False}
+        if len(decisions) < min_samples:
+            result["reason"] = f"need at least {min_samples} logged decisions"
+            return {**result, **self.describe()}
+
+        accept_below = 0.0
+        relevant = 0
+        for n, (distance, is_relevant) in enumerate(decisions, start=1):
+            relevant += is_relevant
+            if n >= min_samples // 2 and relevant / n >= target:
+                accept_below = distance
+
+        reject_above = decisions[-1][0]
+        irrelevant = 0
+        for n, (distance, is_relevant) in enumerate(reversed(decisions), start=1):
+            irrelevant += not is_relevant
+            if n >= min_samples // 2 and irrelevant / n >= target:
+                reject_above = distance
+
+        if accept_below > reject_above:
+            result["reason"] = "decisions do not separate by distance; thresholds unchanged"
+            return {**result, **self.describe()}
+
+        self.accept_below, self.reject_above = accept_below, reject_above
+        try:
+            Path(self.thresholds_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(self.thresholds_path).write_text(
+                json.dumps({"accept_below": accept_below, "reject_above": reject_above}), encoding="utf-8",
+            )
+        except OSError as exc:
+            logger.warning("Could not persist grading thresholds: %s", exc)
+
+        result["updated"] = True
+        return {**result, **self.describe()}
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "accept_below": self.accept_below,
+            "reject_above": self.reject_above,
+            "audit_rate": self.audit_rate,
+            **self.counts,
+        }
+
+
+grading_policy = GradingPolicy(
+    accept_below=settings.GRADER_ACCEPT_DISTANCE,
+    reject_above=settings.GRADER_REJECT_DISTANCE,
+    log_path=settings.GRADER_DECISION_LOG,
+    thresholds_path=settings.GRADER_THRESHOLDS_PATH,
+    audit_rate=settings.GRADER_AUDIT_RATE,
+)
+
+
+async def grade_hits(llm: ChatOpenAI, query: str, hits: list[dict[str, Any]]) -> list[bool]:
+    """Grade knowledge base hits, consulting the LLM only in the ambiguous band."""
+    verdicts: list[bool | None] = [
+        grading_policy.decide(hit.get("distance")) if settings.GRADER_POLICY_ENABLED else None
+        for hit in hits
+    ]
+
+    undecided = [i for i, v in enumerate(verdicts) if v is None]
+    if undecided:
+        llm_verdicts = await grade_documents(llm, query, [hits[i]["text"] for i in undecided])
+        grading_policy.counts["llm_graded"] += len(undecided)
+
+        logged = [(hits[i]["distance"], v) for i, v in zip(undecided, llm_verdicts) if hits[i].get("distance") is not None]
+        if logged:
+            # Appending to the log is file I/O; keep it off the event loop
+            await asyncio.to_thread(
+                grading_policy.log_decisions, query, [d for d, _ in logged], [v for _, v in logged]
+            )
+
+        for i, verdict in zip(undecided, llm_verdicts):
+            verdicts[i] = verdict
+
+    return [bool(v) for v in verdicts]
@@ -2,16 +2,33 @@
 
 Corresponds to the 'Planning Agent' node in the enterprise MAS architecture.
 Uses an LLM call to produce a structured plan that downstream agents execute.
+Simple queries skip that call: the query classifier answers small talk with
+an empty plan (straight to the responder) and turns short single questions
+into a one-task plan, and plans the LLM produced are reused from the plan
+cache for repeated queries. Follow-up queries are planned with the
+conversation history in view (and never served from the plan cache).
+
+The LLM's reply is parsed while it streams: each sub-task is emitted as soon
+as its JSON object is complete, and its knowledge base hop is started right
+away, so retrieval for the first sub-tasks overlaps the rest of the plan's
+generation.
 """
 
 from __future__ import annotations
 
 import json
+from typing import Any
 
-from langchain_openai import ChatOpenAI
-
+from app.agents.classifier import classify_query
+from app.agents.searcher import retrieval_prefetch
+from app.core.checkpoints import current_run_id
 from app.core.config import settings
-from app.core.state import AgentState
+from app.core.context import pack_history
+from app.core.llm import get_llm
+from app.core.memo import memo_astream
+from app.core.metrics import plan_routes
+from app.core.plan_cache import plan_cache
+from app.core.state import AgentState, SubTask
 
 
 PLAN_SYSTEM = """You are a planning agent inside an enterprise multi-agent system.
@@ -22,49 +39,167 @@ Each sub-task must specify:
 - "description": what needs to be done
 - "tool": one of "search", "calculate", "code", "general"
 - "status": always "pending"
+- "depends_on": ids of earlier sub-tasks whose results this one needs ([] if none)
+
+Sub-tasks without dependencies run in parallel, so only list a dependency
+when the sub-task genuinely cannot start without that result.
+
+If the conversation so far is given, make every description self-contained:
+resolve what the current query refers to.
 
 Respond ONLY with a JSON array. No markdown, no explanation."""
 
 
-def planning_node(state: AgentState) -> dict:
+def _with_ids(plan: list[SubTask]) -> list[SubTask]:
+    """Give every sub-task a unique id, which the plan reducer merges updates by.
+
+    Ids the planner assigned are kept (the first task wins a duplicate);
+    missing, duplicate or non-integer ids get the next free integer.
+    """
+    explicit = {t["id"] for t in plan if isinstance(t.get("id"), int)}
+    used: set[int] = set()
+    next_id = 1
+    for task in plan:
+        task_id = task.get("id")
+        if not isinstance(task_id, int) or task_id in used:
+            while next_id in explicit or next_id in used:
+                next_id += 1
+            task["id"] = task_id = next_id
+        used.add(task_id)
+    return plan
+
+
+def _single_task_plan(query: str, history: list[dict[str, str]] | None = None) -> list[SubTask]:
+    """One task for the whole query; a follow-up names the question it follows."""
+    previous = [m["content"] for m in history or [] if m.get("role") == "user"]
+    description = f"{query} (follow-up to: {previous[-1]})" if previous else query
+    return _with_ids([
+        {
+            "id": 1,
+            "description": description,
+            "tool": "general",
+            "status": "pending",
+            "depends_on": [],
+        }
+    ])
+
+
+class PlanStreamParser:
+    """Incremental parser of the planner's JSON array of sub-tasks.
+
+    `feed` takes the next piece of the reply and returns the objects it
+    completed. Text before the array (a markdown fence, "json") is skipped;
+    `done` is set once the array is closed.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = -1
+        self.done = False
+
+    def feed(self, piece: str) -> list[dict[str, Any]]:
+        self._text += piece
+        objects: list[dict[str, Any]] = []
+        while self._pos < len(self._text) and not self.done:
+            char = self._text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if char == "[":
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if self._depth == 1 and char == "{":
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                elif self._depth == 1 and self._object_start >= 0:
+                    try:
+                        value = json.loads(self._text[self._object_start:self._pos + 1])
+                    except json.JSONDecodeError:
+                        value = None
+                    if isinstance(value, dict):
+                        objects.append(value)
+                    self._object_start = -1
+            self._pos += 1
+        return objects
+
+
+async def planning_node(state: AgentState) -> dict:
     """LangGraph node: produces a plan from the user query."""
 
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        api_key=settings.OPENAI_API_KEY,
-        temperature=0.0,
-    )
+    history = state.get("chat_history") or []
+
+    if settings.PLANNER_FAST_PATH_ENABLED:
+        route = classify_query(state["query"])
+        if route == "direct":
+            plan_routes.inc(route="direct")
+            return {"plan": []}
+        if route == "single":
+            plan_routes.inc(route="single")
+            return {"plan": _single_task_plan(state["query"], history)}
+
+    if settings.PLAN_CACHE_ENABLED and not history:
+        cached = plan_cache.get(state["query"])
+        if cached is not None:
+            plan_routes.inc(route="cached")
+            return {"plan": _with_ids(cached)}
+
+    plan_routes.inc(route="llm")
+    llm = get_llm("planner", temperature=0.0)
+
+    user_content = state["query"]
+    if history:
+        conversation = pack_history(history, settings.CONTEXT_BUDGET_HISTORY, llm.model_name)
+        user_content = f"Conversation so far:\n{conversation}\n\nCurrent query: {state['query']}"
 
     messages = [
         {"role": "system", "content": PLAN_SYSTEM},
-        {"role": "user", "content": state["query"]},
+        {"role": "user", "content": user_content},
     ]
 
-    response = llm.invoke(messages)
-    raw = response.content.strip()
-
-    # Robust JSON extraction
-    if "```" in raw:
-        raw = raw.split("```")[1]
-        if raw.startswith("json"):
-            raw = raw[4:]
-
+    # Session runs may not need the knowledge base at all (see search_node); hops belong to a run
+    run_id = current_run_id()
+    prefetch = (
+        settings.PLAN_PREFETCH_ENABLED
+        and run_id is not None
+        and not (state.get("session_id") or state.get("session_documents"))
+    )
+    parser = PlanStreamParser()
+    plan: list[SubTask] = []
     try:
-        plan = json.loads(raw)
-    except json.JSONDecodeError:
-        plan = [
-            {
-                "id": 1,
-                "description": state["query"],
-                "tool": "general",
-                "status": "pending",
-            }
-        ]
-
-    return {
-        "plan": plan,
-        "current_task_index": 0,
-        "search_queries": [],
-        "context_documents": [],
-        "tool_results": [],
-    }
+        async for piece in memo_astream(llm, messages):
+            for task in parser.feed(piece):
+                task.setdefault("status", "pending")
+                task.setdefault("depends_on", [])
+                plan.append(task)
+                if prefetch:
+                    retrieval_prefetch.start(run_id, state["query"], task)
+    except BaseException:
+        if prefetch:
+            retrieval_prefetch.discard(run_id)
+        raise
+
+    if not parser.done or not plan:
+        if prefetch:
+            retrieval_prefetch.discard(run_id)
+        return {"plan": _single_task_plan(state["query"], history)}
+
+    _with_ids(plan)
+    if settings.PLAN_CACHE_ENABLED and not history:
+        plan_cache.put(state["query"], plan)
+
+    return {"plan": plan}
@@ -6,9 +6,10 @@ tool results, and the plan into a coherent, well-structured response.
 
 from __future__ import annotations
 
-from langchain_openai import ChatOpenAI
-
 from app.core.config import settings
+from app.core.context import pack_context, pack_history
+from app.core.llm import get_llm
+from app.core.scheduler import ainvoke_llm
 from app.core.state import AgentState
 
 
@@ -19,21 +20,23 @@ Guidelines:
 - Be accurate and cite the context when relevant.
 - Structure the response clearly.
 - If the review agent provided feedback, incorporate it.
+- For a follow-up question, use the conversation so far to resolve what it refers to.
 - Keep the response focused and professional.
 - Use the user's language (detect from the query).
 """
 
 
-def respond_node(state: AgentState) -> dict:
+async def respond_node(state: AgentState) -> dict:
     """LangGraph node: generates or revises the final response."""
 
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        api_key=settings.OPENAI_API_KEY,
-        temperature=0.3,
-    )
+    llm = get_llm("responder", temperature=0.3)
 
-    context_block = "\n---\n".join(state.get("context_documents", [])[:5])
+    context_block = pack_context(
+        state.get("context_documents", []),
+        target=state["query"],
+        budget=settings.CONTEXT_BUDGET_RESPONDER,
+        model=llm.model_name,
+    )
 
     tool_outputs = "\n".join(
         f"- Task {r.get('task_id', '?')}: {str(r.get('output', ''))[:800]}"
@@ -45,6 +48,11 @@ def respond_node(state: AgentState) -> dict:
         for t in state.get("plan", [])
     )
 
+    conversation = ""
+    if state.get("chat_history"):
+        history = pack_history(state["chat_history"], settings.CONTEXT_BUDGET_HISTORY, llm.model_name)
+        conversation = f"Conversation so far:\n{history}\n\n"
+
     feedback = state.get("review_feedback", "")
     prior_draft = state.get("draft_response", "")
 
@@ -60,6 +68,7 @@ def respond_node(state: AgentState) -> dict:
         {
             "role": "user",
             "content": (
+                f"{conversation}"
                 f"User query: {state['query']}\n\n"
                 f"Plan:\n{plan_summary}\n\n"
                 f"Retrieved context:\n{context_block}\n\n"
@@ -69,7 +78,7 @@ def respond_node(state: AgentState) -> dict:
         },
     ]
 
-    response = llm.invoke(messages)
+    response = await ainvoke_llm(llm, messages)
     draft = response.content.strip()
 
     return {"draft_response": draft}
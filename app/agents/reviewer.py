@@ -8,9 +8,8 @@ from __future__ import annotations
 
 import json
 
-from langchain_openai import ChatOpenAI
-
-from app.core.config import settings
+from app.core.llm import get_llm
+from app.core.memo import memo_ainvoke
 from app.core.state import AgentState
 
 
@@ -28,14 +27,10 @@ Respond ONLY with a JSON object:
 Be strict but fair. Pass if the response is adequate, even if imperfect."""
 
 
-def review_node(state: AgentState) -> dict:
+async def review_node(state: AgentState) -> dict:
     """LangGraph node: reviews the draft response."""
 
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        api_key=settings.OPENAI_API_KEY,
-        temperature=0.0,
-    )
+    llm = get_llm("reviewer", temperature=0.0)
 
     revision_count = state.get("revision_count", 0)
 
@@ -64,8 +59,7 @@ def review_node(state: AgentState) -> dict:
         },
     ]
 
-    response = llm.invoke(messages)
-    raw = response.content.strip()
+    raw = (await memo_ainvoke(llm, messages)).strip()
 
     if "```" in raw:
         raw = raw.split("```")[1]
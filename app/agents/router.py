@@ -1,30 +1,79 @@
 """Router: conditional edge functions that determine graph traversal.
 
-Implements the DAG branching logic — decides whether to continue
-executing sub-tasks, loop back for revision, or finalize the response.
+Implements the DAG branching logic — decides which sub-tasks can run next
+(fanned out in parallel), loop back for revision, or finalize the response.
 """
 
 from __future__ import annotations
 
+from langgraph.types import Send
+
+from app.core.budget import can_afford
 from app.core.state import AgentState
 
 
-def route_after_executor(state: AgentState) -> str:
-    """After executing a sub-task, decide: execute more or generate response."""
-    plan = state.get("plan", [])
-    idx = state.get("current_task_index", 0)
+def route_tasks(state: AgentState) -> list[Send] | str:
+    """Dispatch every pending sub-task whose dependencies are finished, or respond.
 
+    Each ready sub-task gets its own search → execute worker; all workers of a
+    round run concurrently and the graph comes back here once they are done.
+    """
+    plan = state.get("plan", [])
     pending = [t for t in plan if t.get("status") == "pending"]
 
-    if pending and idx < len(plan):
-        # More tasks to process — loop back to search + execute
-        return "search"
+    if not pending:
+        return "respond"
+
+    # Out of time: answer with what the finished sub-tasks produced
+    if not can_afford(state.get("deadline"), "task", then=("respond",)):
+        return "respond"
+
+    known = {t.get("id") for t in plan}
+    finished = {t.get("id") for t in plan if t.get("status") != "pending"}
+
+    ready = [
+        t for t in pending
+        if all(dep in finished or dep not in known for dep in t.get("depends_on", []))
+    ]
+
+    if not ready:
+        # Circular dependencies — run what is left rather than stall
+        ready = pending
 
-    return "respond"
+    results = {r.get("task_id"): r.get("output", "") for r in state.get("tool_results", [])}
+
+    return [
+        Send("agent_task", {
+            "query": state["query"],
+            "task": task,
+            "session_id": state.get("session_id"),
+            "session_documents": state.get("session_documents", []),
+            "deadline": state.get("deadline"),
+            "prior_results": [
+                {"task_id": dep, "output": results[dep]}
+                for dep in task.get("depends_on", []) if dep in results
+            ],
+        })
+        for task in ready
+    ]
+
+
+def route_after_respond(state: AgentState) -> str:
+    """After responding, review the draft unless the latency budget cannot afford it.
+
+    Small talk answered without a plan has nothing to review.
+    """
+    if not state.get("plan"):
+        return "finalize"
+    if can_afford(state.get("deadline"), "review"):
+        return "review"
+    return "finalize"
 
 
 def route_after_review(state: AgentState) -> str:
-    """After review, decide: finalize or revise."""
+    """After review, decide: finalize or revise (if a revision still fits the budget)."""
     if state.get("review_passed", False):
         return "finalize"
+    if not can_afford(state.get("deadline"), "respond", then=("review",)):
+        return "finalize"
     return "revise"
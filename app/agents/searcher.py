@@ -2,82 +2,169 @@
 
 Implements the 'Search Agent' from the architecture — performs iterative
 retrieval, grades relevance, and rephrases queries when documents are irrelevant.
+Within a session, documents graded relevant in earlier turns are reused first
+and the knowledge base is only queried when they are not enough.
+The web and fallback hops are skipped when the request's latency budget
+cannot afford them on top of executing the task and responding.
+
+The knowledge base hop of a sub-task may already be running when its search
+node starts: the planner prefetches it as soon as the sub-task appears in
+its streamed reply (see `retrieval_prefetch`).
 """
 
 from __future__ import annotations
 
-from langchain_openai import ChatOpenAI
+import asyncio
+import time
 
-from app.core.config import settings
-from app.core.state import AgentState
-from app.tools.web_search import web_search
-from app.tools.knowledge_base import query_knowledge_base
+from langchain_openai import ChatOpenAI
 
+from app.core.budget import can_afford
+from app.core.checkpoints import current_run_id
+from app.core.context import make_documents
+from app.core.llm import get_llm
+from app.core.memo import memo_ainvoke
+from app.core.metrics import record_cache, search_hop_latency
+from app.core.sessions import select_documents, session_store
+from app.core.state import SubTask, TaskState
+from app.agents.grader import grade_documents, grade_hits
+from app.tools.web_search import aweb_search
+from app.tools.knowledge_base import asearch_knowledge_base
 
-GRADER_SYSTEM = """You are a relevance grader. Given a user query and a document,
-respond with ONLY 'yes' or 'no' — is the document relevant to answering the query?"""
 
 REPHRASE_SYSTEM = """You are a query optimizer. Given a user query, rephrase it
 to be more effective for web search. Respond with ONLY the rephrased query."""
 
 
-def _grade_document(llm: ChatOpenAI, query: str, doc: str) -> bool:
-    """Return True if the document is relevant to the query."""
-    response = llm.invoke([
-        {"role": "system", "content": GRADER_SYSTEM},
-        {"role": "user", "content": f"Query: {query}\n\nDocument: {doc[:1500]}"},
-    ])
-    return response.content.strip().lower().startswith("yes")
-
-
-def _rephrase_query(llm: ChatOpenAI, query: str) -> str:
+async def _rephrase_query(llm: ChatOpenAI, query: str) -> str:
     """Rephrase a query for better web search results."""
-    response = llm.invoke([
+    reply = await memo_ainvoke(llm, [
         {"role": "system", "content": REPHRASE_SYSTEM},
         {"role": "user", "content": query},
     ])
-    return response.content.strip()
-
-
-def search_node(state: AgentState) -> dict:
+    return reply.strip()
+
+
+async def _kb_hop(grader: ChatOpenAI, task_desc: str) -> list[str]:
+    """Knowledge base hits for a sub-task that the grader keeps."""
+    kb_hits = await asearch_knowledge_base(task_desc)
+    verdicts = await grade_hits(grader, task_desc, kb_hits)
+    return [hit["text"] for hit, relevant in zip(kb_hits, verdicts) if relevant]
+
+
+class RetrievalPrefetch:
+    """Knowledge base hops started before their sub-task's search node runs.
+
+    The planner starts one per sub-task while its reply is still streaming;
+    the search node takes it instead of querying the knowledge base itself.
+    Hops are keyed by run (its checkpoint run id) and task description, and
+    run in the planner's context (so they count towards its run's metrics).
+    Whoever drives a run discards its hops when the run ends, so a cancelled
+    run's hops are cancelled with it; anything left behind expires after
+    `ttl_seconds`. A run stays known until then, so a search node can tell a
+    missed prefetch from a run that never prefetched (a fast path or cached
+    plan).
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        # run id → (hops by task description, when the first one started)
+        self._runs: dict[str, tuple[dict[str, asyncio.Task], float]] = {}
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for run_id in [r for r, (_, started) in self._runs.items() if started < cutoff]:
+            self.discard(run_id)
+
+    def start(self, run_id: str, query: str, task: SubTask) -> None:
+        self._expire()
+        task_desc = task.get("description") or query
+        hops, _ = self._runs.setdefault(run_id, ({}, time.monotonic()))
+        if task_desc in hops:
+            return
+        hop = asyncio.ensure_future(_kb_hop(get_llm("grader", temperature=0.0), task_desc))
+        # Failures surface in the search node; an abandoned hop's must not be logged as unretrieved
+        hop.add_done_callback(lambda t: t.cancelled() or t.exception())
+        hops[task_desc] = hop
+
+    def attempted(self, run_id: str) -> bool:
+        self._expire()
+        return run_id in self._runs
+
+    def take(self, run_id: str, task_desc: str) -> asyncio.Task | None:
+        entry = self._runs.get(run_id)
+        return entry[0].pop(task_desc, None) if entry is not None else None
+
+    def discard(self, run_id: str) -> None:
+        """Cancel a run's hops that no search node has taken, and forget the run."""
+        entry = self._runs.pop(run_id, None)
+        if entry is not None:
+            for hop in entry[0].values():
+                hop.cancel()
+
+
+retrieval_prefetch = RetrievalPrefetch(ttl_seconds=300)
+
+
+async def search_node(state: TaskState) -> dict:
     """LangGraph node: performs multi-hop retrieval for the current sub-task."""
 
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        api_key=settings.OPENAI_API_KEY,
-        temperature=0.0,
-    )
+    grader = get_llm("grader", temperature=0.0)
+    rephraser = get_llm("rephraser", temperature=0.0)
 
-    plan = state.get("plan", [])
-    idx = state.get("current_task_index", 0)
-    task_desc = plan[idx]["description"] if idx < len(plan) else state["query"]
+    task = state.get("task", {})
+    task_desc = task.get("description") or state["query"]
+    deadline = state.get("deadline")
+    downstream = ("execute", "respond")
 
     collected_docs: list[str] = []
     queries_used: list[str] = [task_desc]
 
-    # Hop 1: local knowledge base
-    kb_results = query_knowledge_base(task_desc)
-    for doc in kb_results:
-        if _grade_document(llm, task_desc, doc):
-            collected_docs.append(doc)
+    # Hop 0: documents earlier turns of this session already retrieved and graded
+    if state.get("session_id") or state.get("session_documents"):
+        start = time.perf_counter()
+        if state.get("session_id"):
+            reused = await session_store.relevant_documents(state["session_id"], task_desc)
+        else:
+            # A job's session lives in the API process; the job carries its documents
+            reused = [d["text"] for d in await select_documents(state["session_documents"], task_desc)]
+        collected_docs.extend(reused)
+        record_cache("session_documents", hit=bool(reused))
+        search_hop_latency.observe(time.perf_counter() - start, hop="session")
+
+    # Hop 1: local knowledge base (distance policy settles clear-cut hits), possibly prefetched
+    if len(collected_docs) < 2:
+        start = time.perf_counter()
+        run_id = current_run_id()
+        prefetched = retrieval_prefetch.take(run_id, task_desc) if run_id else None
+        if run_id and retrieval_prefetch.attempted(run_id):
+            record_cache("kb_prefetch", hit=prefetched is not None)
+        if prefetched is not None:
+            collected_docs.extend(await prefetched)
+        else:
+            collected_docs.extend(await _kb_hop(grader, task_desc))
+        search_hop_latency.observe(time.perf_counter() - start, hop="kb")
 
     # Hop 2: web search (original or rephrased query)
-    if len(collected_docs) < 2:
-        rephrased = _rephrase_query(llm, task_desc)
+    if len(collected_docs) < 2 and can_afford(deadline, "web_hop", then=downstream):
+        start = time.perf_counter()
+        rephrased = await _rephrase_query(rephraser, task_desc)
         queries_used.append(rephrased)
-        web_results = web_search(rephrased, max_results=3)
-        for doc in web_results:
-            if _grade_document(llm, task_desc, doc):
-                collected_docs.append(doc)
+        web_results = await aweb_search(rephrased, max_results=3)
+        verdicts = await grade_documents(grader, task_desc, web_results)
+        collected_docs.extend(doc for doc, relevant in zip(web_results, verdicts) if relevant)
+        search_hop_latency.observe(time.perf_counter() - start, hop="web")
 
     # Hop 3: fallback broader search
-    if not collected_docs:
-        broader = _rephrase_query(llm, f"broader context: {task_desc}")
+    if not collected_docs and can_afford(deadline, "fallback_hop", then=downstream):
+        start = time.perf_counter()
+        broader = await _rephrase_query(rephraser, f"broader context: {task_desc}")
         queries_used.append(broader)
-        web_results = web_search(broader, max_results=3)
+        web_results = await aweb_search(broader, max_results=3)
         collected_docs.extend(web_results[:2])
+        search_hop_latency.observe(time.perf_counter() - start, hop="fallback")
 
     return {
-        "context_documents": collected_docs,
+        "context_documents": make_documents(collected_docs, task.get("id")),
         "search_queries": queries_used,
     }
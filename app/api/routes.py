@@ -1,22 +1,61 @@
 """API Routes: FastAPI endpoints for the enterprise MAS.
 
 Exposes:
-  POST /api/chat       — run a query through the multi-agent graph
-  POST /api/ingest     — add documents to the knowledge base
-  GET  /api/health     — health check
+  POST /api/chat               — run a query through the multi-agent graph
+  POST /api/chat/stream        — same, streamed as Server-Sent Events
+  POST /api/chat/resume/{id}   — continue a failed or cancelled run from its last completed step
+  POST /api/chat/batch         — answer many queries with bounded concurrency (NDJSON results)
+  POST /api/chat/batch/upload  — same, reading the queries from a .jsonl file
+  POST /api/jobs               — queue a query for the background workers
+  GET  /api/jobs/{id}          — a job's status and queue position
+  GET  /api/jobs/{id}/result   — a finished job's answer
+  DELETE /api/jobs/{id}        — cancel a job that has not started
+  GET  /api/sessions/{id}      — a session's compacted history and document count
+  DELETE /api/sessions/{id}   — forget a session
+  POST /api/ingest             — add documents to the knowledge base
+  POST /api/ingest/upload      — stream a .txt/.jsonl file into the knowledge base (NDJSON progress)
+  GET  /api/cache/stats        — semantic, LLM memo, plan, session, web search and embedding cache statistics
+  GET  /api/metrics            — Prometheus metrics: node/LLM latency, tokens, cost, cache hits
+  GET  /api/grading/policy     — distance thresholds, grading counters and shared-grading savings
+  POST /api/grading/calibrate  — recalibrate thresholds from logged grader decisions
+  GET  /api/health             — health check
 """
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import time
-from typing import Any
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
+from app.agents.grader import enable_shared_grading, grading_policy, shared_grader
+from app.core.budget import deadline_from
+from app.core.checkpoints import new_run_id, run_config
+from app.core.coalescing import SharedRun, chat_runs, coalesce_key
+from app.core.config import settings
+from app.core.jobs import job_queue
+from app.core.memo import llm_memo
+from app.core.metrics import (
+    RunMetrics,
+    coalesced_requests,
+    record_cancellation,
+    record_request,
+    render_prometheus,
+    start_run,
+)
+from app.core.plan_cache import plan_cache
+from app.core.scheduler import SchedulerSaturated, llm_scheduler
+from app.core.semantic_cache import lookup_response, semantic_cache, store_response
+from app.core.sessions import session_store
 from app.graph import mas_graph
-from app.tools.knowledge_base import ingest_documents
+from app.tools.embeddings import embedding_stats
+from app.tools.ingestion import ingest_documents, ingest_stream, read_upload, upload_lines
+from app.tools.web_search import web_search_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api")
@@ -25,6 +64,10 @@ router = APIRouter(prefix="/api")
 class ChatRequest(BaseModel):
     query: str
     chat_history: list[dict[str, str]] = []
+    session_id: str | None = Field(default=None, min_length=1, max_length=128)
+    bypass_cache: bool = False
+    include_metrics: bool = False
+    max_latency_ms: int | None = Field(default=None, gt=0)
 
 
 class ChatResponse(BaseModel):
@@ -35,6 +78,33 @@ class ChatResponse(BaseModel):
     review_passed: bool
     review_feedback: str
     elapsed_ms: int
+    cached: bool = False
+    coalesced: bool = False
+    run_id: str | None = None
+    metrics: dict[str, Any] | None = None
+
+
+class ResumeRequest(BaseModel):
+    include_metrics: bool = False
+
+
+class BatchItem(ChatRequest):
+    id: str | None = None
+
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem] = Field(min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+    concurrency: int | None = Field(default=None, gt=0)
+
+
+class JobRequest(BaseModel):
+    query: str
+    chat_history: list[dict[str, str]] = []
+    session_id: str | None = Field(default=None, min_length=1, max_length=128)
+    include_metrics: bool = False
+    max_latency_ms: int | None = Field(default=None, gt=0)
+    # Higher runs first
+    priority: int = Field(default=0, ge=-100, le=100)
 
 
 class IngestRequest(BaseModel):
@@ -43,50 +113,707 @@ class IngestRequest(BaseModel):
 
 class IngestResponse(BaseModel):
     ingested: int
+    chunks: int
+    stored: int
+    duplicates: int
+
+
+def _initial_state(req: ChatRequest) -> dict[str, Any]:
+    """Graph input; a session supplies the history when the client sends none."""
+    history = req.chat_history
+    if req.session_id and not history:
+        history = session_store.get_or_create(req.session_id).history()
+    return {
+        "query": req.query,
+        "chat_history": history,
+        "session_id": req.session_id,
+        "deadline": deadline_from(req.max_latency_ms),
+        "revision_count": 0,
+    }
+
+
+def _run_metrics(req: ChatRequest | ResumeRequest, run: RunMetrics | None) -> dict[str, Any] | None:
+    return run.summary() if req.include_metrics and run is not None else None
+
+
+def _graph_run(req: ChatRequest, endpoint: str, admit: bool = True) -> tuple[SharedRun, bool]:
+    """Attach to an identical run already in flight, or admit and start a new one.
+
+    Returns (run, coalesced). Raises 429 if a new run cannot be admitted;
+    callers that bound their own concurrency (batches) pass `admit=False`.
+    """
+    key = coalesce_key(req.query, req.chat_history, req.session_id, req.max_latency_ms)
+    shared = chat_runs.get(key)
+    if shared is not None:
+        coalesced_requests.inc(endpoint=endpoint)
+        return shared, True
+
+    if admit:
+        _admit(endpoint)
+    run_id = new_run_id()
+    return chat_runs.start(key, lambda: mas_graph.astream(
+        _initial_state(req),
+        run_config(run_id),
+        stream_mode=["updates", "messages", "values"],
+        subgraphs=True,
+        durability=settings.CHECKPOINT_DURABILITY,
+    ), run_id=run_id), False
+
+
+def _cacheable(req: ChatRequest) -> bool:
+    """Answers that depend on prior turns are never shared between users.
+
+    Session turns always run the graph, so the session records them. Runs
+    with a latency budget may skip steps, so their answers are not shared either.
+    """
+    return (
+        settings.SEMANTIC_CACHE_ENABLED
+        and not req.chat_history
+        and not req.session_id
+        and not req.max_latency_ms
+    )
+
+
+def _cache_payload(response: ChatResponse) -> dict[str, Any]:
+    return response.model_dump(exclude={"elapsed_ms", "cached", "coalesced", "run_id", "metrics"})
+
+
+def _build_response(result: dict[str, Any], elapsed: int, run_id: str | None = None) -> ChatResponse:
+    return ChatResponse(
+        response=result.get("final_response", result.get("draft_response", "No response generated.")),
+        plan=result.get("plan", []),
+        search_queries=result.get("search_queries", []),
+        tool_results=result.get("tool_results", []),
+        review_passed=result.get("review_passed", False),
+        review_feedback=result.get("review_feedback", ""),
+        elapsed_ms=elapsed,
+        run_id=run_id,
+    )
+
+
+def _run_headers(shared: SharedRun) -> dict[str, str]:
+    """Error responses carry the run id, so the client can resume the run."""
+    return {"X-Run-Id": shared.run_id} if shared.run_id else {}
+
+
+def _saturated(retry_after: float, headers: dict[str, str] | None = None) -> HTTPException:
+    """Fast 429 while the LLM scheduler is saturated, instead of queueing behind everyone."""
+    return HTTPException(
+        status_code=429,
+        detail="Too many requests in flight; retry later.",
+        headers={"Retry-After": str(int(retry_after)), **(headers or {})},
+    )
+
+
+def _admit(endpoint: str) -> None:
+    retry_after = llm_scheduler.admission_retry_after()
+    if retry_after is not None:
+        record_request(endpoint, "rejected", 0.0)
+        raise _saturated(retry_after)
+
+
+def _hard_timeout() -> float | None:
+    return settings.REQUEST_TIMEOUT or None
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL)
+
+
+async def _wait_cancellable(request: Request | None, shared: SharedRun, endpoint: str) -> dict[str, Any]:
+    """Wait for a graph run, detaching when the client disconnects or the hard deadline passes.
+
+    Once its last waiter detaches the run is cancelled, which aborts
+    in-flight LLM and web calls and schedules no further nodes. Raises
+    HTTPException 499 (client gone) or 504 (deadline). Without a `request`
+    (batch items) only the deadline applies; cancelling the caller detaches.
+    """
+    graph_task = asyncio.ensure_future(shared.wait())
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request)) if request is not None else None
+    try:
+        done, _ = await asyncio.wait(
+            {graph_task, watcher} - {None}, timeout=_hard_timeout(), return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if not graph_task.done():
+            graph_task.cancel()
+
+    if graph_task in done:
+        return graph_task.result()
+
+    try:
+        await graph_task
+    except asyncio.CancelledError:
+        pass
+
+    if watcher is not None and watcher in done:
+        record_cancellation(endpoint, "disconnect")
+        raise HTTPException(status_code=499, detail="Client closed request.", headers=_run_headers(shared))
+    record_cancellation(endpoint, "deadline")
+    raise HTTPException(status_code=504, detail="Request deadline exceeded.", headers=_run_headers(shared))
+
+
+async def _await_run(request: Request | None, shared: SharedRun, endpoint: str, start: float) -> dict[str, Any]:
+    """Final state of a graph run, mapping failures to HTTP errors that carry the run id."""
+    try:
+        result = await _wait_cancellable(request, shared, endpoint)
+    except HTTPException:
+        record_request(endpoint, "cancelled", time.perf_counter() - start)
+        raise
+    except SchedulerSaturated as exc:
+        record_request(endpoint, "rejected", time.perf_counter() - start)
+        raise _saturated(exc.retry_after, _run_headers(shared))
+    except Exception as exc:
+        logger.exception("Graph execution failed")
+        record_request(endpoint, "error", time.perf_counter() - start)
+        raise HTTPException(status_code=500, detail=str(exc), headers=_run_headers(shared))
+
+    record_request(endpoint, "ok", time.perf_counter() - start)
+    return result
+
+
+async def _answer(req: ChatRequest, request: Request | None, endpoint: str, admit: bool = True) -> ChatResponse:
+    """Answer one query: semantic cache, else a (possibly coalesced) graph run."""
+    if not req.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    start = time.perf_counter()
+    run = start_run()
+
+    embedding = None
+    if _cacheable(req) and not req.bypass_cache:
+        cached, embedding = await lookup_response(req.query)
+        if cached is not None:
+            record_request(endpoint, "cached", time.perf_counter() - start)
+            elapsed = int((time.perf_counter() - start) * 1000)
+            return ChatResponse(**cached, elapsed_ms=elapsed, cached=True, metrics=_run_metrics(req, run))
+
+    shared, coalesced = _graph_run(req, endpoint, admit)
+    result = await _await_run(request, shared, endpoint, start)
+
+    elapsed = int((time.perf_counter() - start) * 1000)
+    response = _build_response(result, elapsed, shared.run_id)
+    response.coalesced = coalesced
+    response.metrics = _run_metrics(req, shared.metrics)
+
+    # The run's first requester caches the answer
+    if _cacheable(req) and not coalesced:
+        await store_response(req.query, _cache_payload(response), embedding)
+
+    return response
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request):
     """Run a query through the full multi-agent pipeline."""
+    return await _answer(req, request, "chat")
+
+
+@router.post("/chat/resume/{run_id}", response_model=ChatResponse)
+async def chat_resume(run_id: str, request: Request, req: ResumeRequest | None = None):
+    """Continue a failed or cancelled run from its last completed step.
+
+    A run still in flight is attached to rather than executed twice; a run
+    that already finished returns its final state without any LLM call.
+    """
+    req = req or ResumeRequest()
+    if not settings.CHECKPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Run checkpointing is disabled.")
+
+    start = time.perf_counter()
+    run = start_run()
+
+    shared = chat_runs.get_run(run_id)
+    coalesced = shared is not None
+    if shared is None:
+        config = run_config(run_id)
+        snapshot = await mas_graph.aget_state(config)
+        if not snapshot.values:
+            raise HTTPException(status_code=404, detail="Unknown or expired run.")
+
+        if not snapshot.next:
+            record_request("chat_resume", "ok", time.perf_counter() - start)
+            elapsed = int((time.perf_counter() - start) * 1000)
+            response = _build_response(snapshot.values, elapsed, run_id)
+            response.metrics = _run_metrics(req, run)
+            return response
+
+        # Resumes keep the run's original deadline (see app.core.budget)
+        _admit("chat_resume")
+        shared = chat_runs.start(f"resume:{run_id}", lambda: mas_graph.astream(
+            None,
+            config,
+            stream_mode=["updates", "messages", "values"],
+            subgraphs=True,
+            durability=settings.CHECKPOINT_DURABILITY,
+        ), run_id=run_id)
+    else:
+        coalesced_requests.inc(endpoint="chat_resume")
+
+    result = await _await_run(request, shared, "chat_resume", start)
+
+    elapsed = int((time.perf_counter() - start) * 1000)
+    response = _build_response(result, elapsed, run_id)
+    response.coalesced = coalesced
+    response.metrics = _run_metrics(req, shared.metrics)
+    return response
+
+
+# Graph node name → (public step name, summary of the node's state update).
+# Search/execute run inside the per-sub-task workers, so they carry the task id.
+_STREAM_NODES = {
+    "agent_plan": ("plan", lambda u: {"plan": u.get("plan", [])}),
+    "agent_search": ("search", lambda u: {
+        "search_queries": u.get("search_queries", []),
+        "documents": len(u.get("context_documents", [])),
+    }),
+    "agent_execute": ("execute", lambda u: {
+        "task_id": (u.get("plan") or [{}])[0].get("id"),
+        "tool_results": u.get("tool_results", []),
+    }),
+    "agent_respond": ("respond", lambda u: {"draft": u.get("draft_response", "")}),
+    "agent_review": ("review", lambda u: {
+        "passed": u.get("review_passed", False),
+        "feedback": u.get("review_feedback", ""),
+    }),
+}
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class _StreamFailed:
+    def __init__(self, exc: Exception):
+        self.exc = exc
+
+
+async def _with_deadline(stream: AsyncIterator[Any], timeout: float | None) -> AsyncIterator[Any]:
+    """Re-yield `stream`, raising TimeoutError once `timeout` seconds have passed in total.
+
+    The stream is consumed by its own task, so stopping early — timeout,
+    error or the consumer being cancelled — is a plain `cancel()` of that
+    task, which cancels whatever graph nodes were still running.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def pump() -> None:
+        try:
+            async for item in stream:
+                queue.put_nowait(item)
+        except Exception as exc:
+            queue.put_nowait(_StreamFailed(exc))
+        finally:
+            queue.put_nowait(finished)
+
+    producer = asyncio.ensure_future(pump())
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            item = await asyncio.wait_for(queue.get(), remaining)
+            if item is finished:
+                return
+            if isinstance(item, _StreamFailed):
+                raise item.exc
+            yield item
+    finally:
+        producer.cancel()
+
+
+async def _stream_events(
+    req: ChatRequest,
+    shared: SharedRun,
+    coalesced: bool,
+    start: float,
+    embedding: list[float] | None,
+) -> AsyncIterator[str]:
+    """Translate graph stream chunks into SSE frames.
+
+    Emits `run` with the run id first (to resume with if the stream breaks),
+    `node` after each agent finishes, `token` for every chunk the
+    responder generates, then a single `done` carrying the ChatResponse.
+    A request coalesced onto a run already in flight first replays the
+    events it missed. Past the hard deadline this subscriber detaches and
+    an `error` is emitted; if the client disconnects, the server cancels
+    this generator. The run itself is cancelled once no subscriber is left.
+    """
+    result: dict[str, Any] = {}
+    yield _sse("run", {"run_id": shared.run_id})
+
+    chunks = _with_deadline(shared.subscribe(), _hard_timeout())
+    try:
+        async for namespace, mode, chunk in chunks:
+            if mode == "values":
+                if not namespace:
+                    result = chunk
+            elif mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "agent_respond" and message.content:
+                    yield _sse("token", {"content": message.content})
+            else:
+                for node, update in chunk.items():
+                    if node in _STREAM_NODES and update:
+                        step, summarize = _STREAM_NODES[node]
+                        yield _sse("node", {"node": step, **summarize(update)})
+    except TimeoutError:
+        record_cancellation("chat_stream", "deadline")
+        record_request("chat_stream", "cancelled", time.perf_counter() - start)
+        yield _sse("error", {"detail": "Request deadline exceeded.", "run_id": shared.run_id})
+        return
+    except (asyncio.CancelledError, GeneratorExit):
+        record_cancellation("chat_stream", "disconnect")
+        record_request("chat_stream", "cancelled", time.perf_counter() - start)
+        raise
+    except Exception as exc:
+        logger.exception("Graph streaming failed")
+        record_request("chat_stream", "error", time.perf_counter() - start)
+        yield _sse("error", {"detail": str(exc), "run_id": shared.run_id})
+        return
+    finally:
+        await chunks.aclose()
+
+    record_request("chat_stream", "ok", time.perf_counter() - start)
+    elapsed = int((time.perf_counter() - start) * 1000)
+    response = _build_response(result, elapsed, shared.run_id)
+    response.coalesced = coalesced
+    response.metrics = _run_metrics(req, shared.metrics)
+    yield _sse("done", response.model_dump())
+
+    if _cacheable(req) and not coalesced:
+        await store_response(req.query, _cache_payload(response), embedding)
+
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Run a query through the pipeline, streaming progress as Server-Sent Events.
+
+    A semantic cache hit answers with a single `done` event.
+    """
     if not req.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
     start = time.perf_counter()
+    run = start_run()
+
+    embedding = None
+    if _cacheable(req) and not req.bypass_cache:
+        cached, embedding = await lookup_response(req.query)
+        if cached is not None:
+            record_request("chat_stream", "cached", time.perf_counter() - start)
+            elapsed = int((time.perf_counter() - start) * 1000)
+            response = ChatResponse(**cached, elapsed_ms=elapsed, cached=True, metrics=_run_metrics(req, run))
+            return StreamingResponse(
+                iter([_sse("done", response.model_dump())]),
+                media_type="text/event-stream",
+                headers=_SSE_HEADERS,
+            )
 
+    shared, coalesced = _graph_run(req, "chat_stream")
+
+    return StreamingResponse(
+        _stream_events(req, shared, coalesced, start, embedding),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS,
+    )
+
+
+async def _batch_line(index: int, item: BatchItem) -> dict[str, Any]:
+    """One NDJSON result line: the ChatResponse, or the error with its status and run id."""
+    enable_shared_grading()
     try:
-        initial_state = {
-            "query": req.query,
-            "chat_history": req.chat_history,
-            "revision_count": 0,
+        response = await _answer(item, None, "chat_batch", admit=False)
+    except HTTPException as exc:
+        return {
+            "index": index,
+            "id": item.id,
+            "error": exc.detail,
+            "status": exc.status_code,
+            "run_id": (exc.headers or {}).get("X-Run-Id"),
         }
-        result = mas_graph.invoke(initial_state)
     except Exception as exc:
-        logger.exception("Graph execution failed")
-        raise HTTPException(status_code=500, detail=str(exc))
+        logger.exception("Batch item %d failed", index)
+        return {"index": index, "id": item.id, "error": str(exc), "status": 500, "run_id": None}
+    return {"index": index, "id": item.id, **response.model_dump()}
+
+
+async def _batch_results(items: AsyncIterator[BatchItem | ValueError], concurrency: int) -> AsyncIterator[str]:
+    """Answer `items` with at most `concurrency` in flight, one NDJSON line per item as it finishes.
+
+    Items are read lazily, so an upload is never held in memory whole. A
+    `ValueError` in place of an item (an unparseable upload line) becomes an
+    error line. Batch runs bypass LLM admission control — the bounded
+    concurrency is the batch's admission — and share grading calls with each
+    other. The last line sums up the batch; if the client disconnects, every
+    item still in flight is cancelled.
+    """
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(concurrency)
+    lines: asyncio.Queue = asyncio.Queue()
+    running: set[asyncio.Task] = set()
+    finished = object()
+
+    async def run_item(index: int, item: BatchItem) -> None:
+        try:
+            lines.put_nowait(await _batch_line(index, item))
+        finally:
+            slots.release()
+
+    async def feed() -> None:
+        index = 0
+        try:
+            async for item in items:
+                if index >= settings.BATCH_MAX_ITEMS:
+                    lines.put_nowait({
+                        "error": f"Batch exceeds {settings.BATCH_MAX_ITEMS} items; the rest was skipped.",
+                        "status": 413,
+                    })
+                    break
+                if isinstance(item, ValueError):
+                    lines.put_nowait({"index": index, "id": None, "error": str(item), "status": 422})
+                else:
+                    await slots.acquire()
+                    task = asyncio.ensure_future(run_item(index, item))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                index += 1
+        except Exception as exc:
+            logger.exception("Reading batch items failed")
+            lines.put_nowait({"error": str(exc), "status": 400})
+        await asyncio.gather(*running)
+        lines.put_nowait(finished)
+
+    feeder = asyncio.ensure_future(feed())
+    totals = {"items": 0, "ok": 0, "errors": 0}
+    try:
+        while (line := await lines.get()) is not finished:
+            if "index" in line:
+                totals["items"] += 1
+                totals["errors" if "error" in line else "ok"] += 1
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        feeder.cancel()
+        for task in list(running):
+            task.cancel()
 
     elapsed = int((time.perf_counter() - start) * 1000)
+    yield json.dumps({"done": True, **totals, "elapsed_ms": elapsed}) + "\n"
 
-    return ChatResponse(
-        response=result.get("final_response", result.get("draft_response", "No response generated.")),
-        plan=result.get("plan", []),
-        search_queries=result.get("search_queries", []),
-        tool_results=result.get("tool_results", []),
-        review_passed=result.get("review_passed", False),
-        review_feedback=result.get("review_feedback", ""),
-        elapsed_ms=elapsed,
+
+def _batch_concurrency(requested: int | None) -> int:
+    return min(requested or settings.BATCH_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+
+
+async def _listed(items: list[BatchItem]) -> AsyncIterator[BatchItem]:
+    for item in items:
+        yield item
+
+
+async def _upload_items(file: UploadFile) -> AsyncIterator[BatchItem | ValueError]:
+    """Batch items from a .jsonl upload: each line a query string or a ChatRequest object."""
+    async for line in upload_lines(file):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            yield BatchItem(query=data) if isinstance(data, str) else BatchItem.model_validate(data)
+        except ValueError as exc:
+            yield exc
+
+
+@router.post("/chat/batch")
+async def chat_batch(req: BatchRequest):
+    """Answer many queries, streaming one NDJSON line per item in completion order.
+
+    Lines carry the item's `index` and `id`; the last line is the summary.
+    """
+    return StreamingResponse(
+        _batch_results(_listed(req.items), _batch_concurrency(req.concurrency)),
+        media_type="application/x-ndjson",
     )
 
 
+@router.post("/chat/batch/upload")
+async def chat_batch_upload(
+    file: UploadFile = File(...),
+    concurrency: int | None = Query(default=None, gt=0),
+):
+    """Answer every line of a .jsonl file, streaming NDJSON results as they finish."""
+    return StreamingResponse(
+        _batch_results(_upload_items(file), _batch_concurrency(concurrency)),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/jobs", status_code=202)
+async def job_submit(req: JobRequest):
+    """Queue a query for the background workers; poll the returned job id."""
+    if not req.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+    job = req.model_dump(exclude={"priority"})
+    # Workers are other processes: the session's history and documents travel with the job
+    if req.session_id:
+        session = session_store.get_or_create(req.session_id)
+        if not req.chat_history:
+            job["chat_history"] = session.history()
+        job["session_documents"] = list(session.documents.values())
+    job_id = await asyncio.to_thread(job_queue.submit, job, req.priority)
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _get_job(job_id: str) -> dict[str, Any]:
+    # The queue is SQLite shared with the workers; a held write lock must not block the loop
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    if job["status"] == "done" and job["result"].get("session_id"):
+        # The worker's session memory is its own; the turn belongs to this process's session
+        state = job["result"]["state"]
+        session_store.record_turn(
+            job["result"]["session_id"],
+            state["query"],
+            state.get("final_response", state.get("draft_response", "")),
+            state.get("plan", []),
+            state.get("context_documents", []),
+            job_id=job_id,
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """A job's status: queued (with its queue position), running, done or failed."""
+    job = await _get_job(job_id)
+    job.pop("result")
+    return job
+
+
+@router.get("/jobs/{job_id}/result", response_model=ChatResponse)
+async def job_result(job_id: str):
+    """A finished job's answer; 409 while it is queued or running."""
+    job = await _get_job(job_id)
+    if job["status"] == "failed":
+        headers = {"X-Run-Id": job["run_id"]} if job["run_id"] else None
+        raise HTTPException(status_code=500, detail=job["error"], headers=headers)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+
+    result = job["result"]
+    response = _build_response(result["state"], result["elapsed_ms"], job["run_id"])
+    response.metrics = result["metrics"]
+    return response
+
+
+@router.delete("/jobs/{job_id}")
+async def job_cancel(job_id: str):
+    """Cancel a job that has not started yet."""
+    if await asyncio.to_thread(job_queue.cancel, job_id):
+        return {"cancelled": job_id}
+    job = await _get_job(job_id)
+    raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+
+
 @router.post("/ingest", response_model=IngestResponse)
 async def ingest(req: IngestRequest):
     """Ingest documents into the knowledge base."""
     if not req.documents:
         raise HTTPException(status_code=400, detail="No documents provided.")
 
-    count = ingest_documents(req.documents)
-    return IngestResponse(ingested=count)
+    totals = await ingest_documents(req.documents)
+
+    # Cached answers may be stale once the knowledge base changes
+    semantic_cache.clear()
+
+    return IngestResponse(
+        ingested=totals["documents"],
+        chunks=totals["chunks"],
+        stored=totals["stored"],
+        duplicates=totals["duplicates"],
+    )
+
+
+async def _ingest_progress(file: UploadFile) -> AsyncIterator[str]:
+    """Run the ingestion pipeline over an upload, one NDJSON line per stored batch."""
+    try:
+        async for progress in ingest_stream(read_upload(file)):
+            yield json.dumps(progress) + "\n"
+    except Exception as exc:
+        logger.exception("Upload ingestion failed")
+        yield json.dumps({"error": str(exc)}) + "\n"
+    else:
+        yield json.dumps({"done": True}) + "\n"
+    finally:
+        semantic_cache.clear()
+
+
+@router.post("/ingest/upload")
+async def ingest_upload(file: UploadFile = File(...)):
+    """Ingest a .txt (blank-line separated) or .jsonl file, streaming progress."""
+    return StreamingResponse(_ingest_progress(file), media_type="application/x-ndjson")
+
+
+@router.get("/sessions/{session_id}")
+async def session_info(session_id: str):
+    """A session's compacted history and how many documents it holds."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session.")
+    return session.describe()
+
+
+@router.delete("/sessions/{session_id}")
+async def session_delete(session_id: str):
+    """Forget a session's history and documents."""
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired session.")
+    return {"deleted": session_id}
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss statistics of every cache layer."""
+    return {
+        "semantic": semantic_cache.stats(),
+        "llm_memo": await asyncio.to_thread(llm_memo.stats),
+        "plan": plan_cache.stats(),
+        "sessions": session_store.stats(),
+        "web_search": web_search_service.stats(),
+        "embeddings": await asyncio.to_thread(embedding_stats),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Process-wide metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/grading/policy")
+async def grading_policy_info():
+    """Current distance thresholds and how many KB hits each path decided."""
+    return {**grading_policy.describe(), "shared": shared_grader.stats()}
+
+
+@router.post("/grading/calibrate")
+async def grading_calibrate():
+    """Recompute distance thresholds from the logged LLM grader decisions."""
+    return await asyncio.to_thread(grading_policy.calibrate)
 
 
 @router.get("/health")
 async def health():
-    return {"status": "ok", "service": "Enterprise MAS"}
+    return {
+        "status": "ok",
+        "service": "Enterprise MAS",
+        "llm_scheduler": llm_scheduler.stats(),
+        "coalescing": chat_runs.stats(),
+        "jobs": await asyncio.to_thread(job_queue.stats),
+    }
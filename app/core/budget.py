@@ -0,0 +1,70 @@
+"""Latency budget: lets a request bound its response time by pruning graph work.
+
+A request with `max_latency_ms` carries an absolute `deadline` (epoch
+seconds) in the graph state. Before an optional step — the web hop, the
+fallback hop, review, a revision, another round of sub-tasks — the caller
+asks `can_afford`, which compares the remaining time with the step's
+expected duration plus whatever must still run after it (e.g. the
+response). Expected durations are the observed means from app.core.metrics,
+falling back to the configured defaults until a step has been measured.
+"""
+
+from __future__ import annotations
+
+import time
+
+from app.core.config import settings
+from app.core.metrics import budget_skips, node_latency, search_hop_latency
+
+
+def deadline_from(max_latency_ms: int | None) -> float | None:
+    """Absolute deadline for a request budget (None: unbounded)."""
+    if not max_latency_ms:
+        return None
+    return time.time() + max_latency_ms / 1000
+
+
+def remaining_ms(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return (deadline - time.time()) * 1000
+
+
+# Step → parts it is made of: (histogram, labels, default setting)
+_STEPS = {
+    "web_hop": [(search_hop_latency, {"hop": "web"}, "BUDGET_WEB_HOP_MS")],
+    "fallback_hop": [(search_hop_latency, {"hop": "fallback"}, "BUDGET_FALLBACK_HOP_MS")],
+    "execute": [(node_latency, {"node": "agent_execute"}, "BUDGET_EXECUTE_MS")],
+    "respond": [(node_latency, {"node": "agent_respond"}, "BUDGET_RESPOND_MS")],
+    "review": [(node_latency, {"node": "agent_review"}, "BUDGET_REVIEW_MS")],
+    "task": [
+        (node_latency, {"node": "agent_search"}, "BUDGET_SEARCH_MS"),
+        (node_latency, {"node": "agent_execute"}, "BUDGET_EXECUTE_MS"),
+    ],
+}
+
+
+def estimate_ms(step: str) -> float:
+    """Expected duration of a step: its observed mean, or the configured default."""
+    total = 0.0
+    for histogram, labels, default in _STEPS[step]:
+        observed = histogram.mean(**labels)
+        total += observed * 1000 if observed is not None else getattr(settings, default)
+    return total
+
+
+def can_afford(deadline: float | None, step: str, then: tuple[str, ...] = ()) -> bool:
+    """Whether `step` followed by the `then` steps fits in the remaining budget.
+
+    Always true without a deadline. A refusal is counted in
+    mas_budget_skips_total under the step's name.
+    """
+    left = remaining_ms(deadline)
+    if left is None:
+        return True
+
+    if left >= sum(estimate_ms(s) for s in (step, *then)):
+        return True
+
+    budget_skips.inc(step=step)
+    return False
@@ -0,0 +1,186 @@
+"""Run Checkpoints: SQLite-backed LangGraph checkpointer so failed runs resume.
+
+Every graph run is a LangGraph thread whose id is handed to the client as
+`run_id`. The state after each completed step — plan, every finished
+sub-task worker, the draft — is saved to a local SQLite file, so when a
+node fails or the run is cancelled, resuming continues from the last
+completed step instead of redoing planning, search and execution. Runs
+started more than CHECKPOINT_TTL seconds ago are pruned.
+
+With the default CHECKPOINT_DURABILITY "exit" the state is written once, when
+the run ends — successfully, with an error or cancelled — which keeps SQLite
+off the hot path; "async" writes after every step and survives a crash of the
+process as well.
+
+The aiosqlite connection is bound to an event loop while the graph is
+compiled at import time, so the underlying saver is opened on first use.
+Like the LLM scheduler, this assumes a single event loop per process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Sequence
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.config import get_config
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def run_config(run_id: str) -> RunnableConfig:
+    """Graph config that checkpoints (and resumes) under `run_id`."""
+    return {"configurable": {"thread_id": run_id}}
+
+
+def current_run_id() -> str | None:
+    """Run id of the graph run the calling node belongs to, if any."""
+    try:
+        return get_config()["configurable"].get("thread_id")
+    except RuntimeError:
+        return None
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """Lazily opened AsyncSqliteSaver that also records when each run started, for pruning."""
+
+    def __init__(self, path: str, ttl_seconds: float, prune_interval: float):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.prune_interval = prune_interval
+        self._saver: AsyncSqliteSaver | None = None
+        self._open_lock = asyncio.Lock()
+        self._last_prune = 0.0
+        # Runs already recorded in run_started by this process
+        self._recorded: set[str] = set()
+        self._prune_task: asyncio.Task | None = None
+
+    async def _get(self) -> AsyncSqliteSaver:
+        if self._saver is None:
+            async with self._open_lock:
+                if self._saver is None:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    saver = AsyncSqliteSaver(await aiosqlite.connect(self.path), serde=self.serde)
+                    await saver.setup()
+                    async with saver.lock:
+                        await saver.conn.execute(
+                            "CREATE TABLE IF NOT EXISTS run_started ("
+                            " thread_id TEXT PRIMARY KEY, started_at REAL)"
+                        )
+                        await saver.conn.commit()
+                    self._saver = saver
+        return self._saver
+
+    async def _record_start(self, saver: AsyncSqliteSaver, thread_id: str) -> None:
+        if thread_id in self._recorded:
+            return
+        self._recorded.add(thread_id)
+        async with saver.lock:
+            await saver.conn.execute(
+                "INSERT OR IGNORE INTO run_started (thread_id, started_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            await saver.conn.commit()
+
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self._last_prune = time.monotonic()
+            self._recorded.clear()
+            self._prune_task = asyncio.ensure_future(self.prune())
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await (await self._get()).aget_tuple(config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        saver = await self._get()
+        async for item in saver.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saver = await self._get()
+        stored = await saver.aput(config, checkpoint, metadata, new_versions)
+        await self._record_start(saver, str(config["configurable"]["thread_id"]))
+        return stored
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await (await self._get()).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        saver = await self._get()
+        await saver.adelete_thread(thread_id)
+        async with saver.lock:
+            await saver.conn.execute("DELETE FROM run_started WHERE thread_id = ?", (str(thread_id),))
+            await saver.conn.commit()
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        return AsyncSqliteSaver.get_next_version(self, current, channel)
+
+    async def prune(self) -> int:
+        """Delete runs started longer than the TTL ago; returns how many were removed."""
+        saver = await self._get()
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            async with saver.lock:
+                async with saver.conn.execute(
+                    "SELECT thread_id FROM run_started WHERE started_at < ?", (cutoff,)
+                ) as cursor:
+                    stale = [row[0] for row in await cursor.fetchall()]
+            for thread_id in stale:
+                await self.adelete_thread(thread_id)
+        except aiosqlite.Error as exc:
+            logger.warning("Checkpoint pruning failed: %s", exc)
+            return 0
+        return len(stale)
+
+    async def aclose(self) -> None:
+        """Close the SQLite connection (call on application shutdown)."""
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+        if self._saver is not None:
+            await self._saver.conn.close()
+            self._saver = None
+
+
+run_checkpointer = SqliteCheckpointer(
+    path=settings.CHECKPOINT_DB_PATH,
+    ttl_seconds=settings.CHECKPOINT_TTL,
+    prune_interval=settings.CHECKPOINT_PRUNE_INTERVAL,
+)
@@ -0,0 +1,143 @@
+"""Request coalescing: identical concurrent chat requests share one graph run.
+
+A SharedRun consumes a graph stream in its own task and keeps every chunk,
+so any number of subscribers — blocking /chat callers and SSE streams alike
+— can attach while it is in flight and each sees the complete sequence of
+events from the start, then the final state. The run is reference counted:
+when the last subscriber goes away (disconnect, deadline) before it has
+finished, it is cancelled, exactly as an uncoalesced run would be.
+
+Runs are keyed by `coalesce_key` (normalized query, a hash of the chat
+history and anything else that changes the answer) and leave the registry
+as soon as they finish; later repeats are the semantic cache's job. Runs
+are also tracked by their checkpoint run id, so resuming a run that is
+still in flight attaches to it instead of executing it twice.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Callable
+
+from app.agents.searcher import retrieval_prefetch
+from app.core.config import settings
+from app.core.metrics import RunMetrics, start_run
+
+StreamFactory = Callable[[], AsyncIterator[tuple[tuple[str, ...], str, Any]]]
+
+
+def coalesce_key(query: str, chat_history: list[dict[str, str]], *variant: Any) -> str:
+    """Key of requests that would produce the same graph run."""
+    blob = json.dumps(
+        [" ".join(query.lower().split()), chat_history, variant],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class SharedRun:
+    """One in-flight graph stream, replayable to every subscriber."""
+
+    def __init__(
+        self,
+        stream_factory: StreamFactory,
+        on_finish: Callable[[SharedRun], None],
+        run_id: str | None = None,
+    ):
+        self.run_id = run_id
+        self.events: list[tuple[tuple[str, ...], str, Any]] = []
+        self.result: dict[str, Any] = {}
+        self.error: Exception | None = None
+        self.done = False
+        self.metrics: RunMetrics | None = None
+        self._changed = asyncio.Event()
+        self._subscribers = 0
+        self._on_finish = on_finish
+        self._task = asyncio.ensure_future(self._produce(stream_factory))
+
+    async def _produce(self, stream_factory: StreamFactory) -> None:
+        self.metrics = start_run()
+        try:
+            async for namespace, mode, chunk in stream_factory():
+                if mode == "values" and not namespace:
+                    self.result = chunk
+                self.events.append((namespace, mode, chunk))
+                self._notify()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            if self.run_id is not None:
+                # Finished or cancelled, the run has no use for prefetches no search node took
+                retrieval_prefetch.discard(self.run_id)
+            self.done = True
+            self._notify()
+            self._on_finish(self)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[tuple[tuple[str, ...], str, Any]]:
+        """Yield every (namespace, mode, chunk) of the run, past and future."""
+        self._subscribers += 1
+        try:
+            seen = 0
+            while True:
+                while seen < len(self.events):
+                    yield self.events[seen]
+                    seen += 1
+                if self.done:
+                    break
+                await self._changed.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self._subscribers -= 1
+            if not self._subscribers and not self.done:
+                self._on_finish(self)
+                self._task.cancel()
+
+    async def wait(self) -> dict[str, Any]:
+        """Subscribe until the run finishes and return its final state."""
+        async for _ in self.subscribe():
+            pass
+        return self.result
+
+
+class RunCoalescer:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._runs: dict[str, SharedRun] = {}
+        self._by_run_id: dict[str, SharedRun] = {}
+
+    def get(self, key: str) -> SharedRun | None:
+        """The in-flight run for `key`, if any."""
+        return self._runs.get(key) if self.enabled else None
+
+    def get_run(self, run_id: str) -> SharedRun | None:
+        """The in-flight run with checkpoint id `run_id` (tracked even when coalescing is off)."""
+        return self._by_run_id.get(run_id)
+
+    def start(self, key: str, stream_factory: StreamFactory, run_id: str | None = None) -> SharedRun:
+        """Start a run for `key` that later identical requests can attach to."""
+        run = SharedRun(stream_factory, on_finish=lambda finished: self._forget(key, finished), run_id=run_id)
+        if self.enabled:
+            self._runs[key] = run
+        if run_id is not None:
+            self._by_run_id[run_id] = run
+        return run
+
+    def _forget(self, key: str, run: SharedRun) -> None:
+        if self._runs.get(key) is run:
+            del self._runs[key]
+        if run.run_id is not None and self._by_run_id.get(run.run_id) is run:
+            del self._by_run_id[run.run_id]
+
+    def stats(self) -> dict[str, Any]:
+        return {"enabled": self.enabled, "in_flight": len(self._runs)}
+
+
+chat_runs = RunCoalescer(enabled=settings.COALESCE_ENABLED)
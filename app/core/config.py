@@ -8,8 +8,149 @@ class Settings:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "./data/chroma")
+    # Chroma server for client/server mode; empty = embedded store in CHROMA_PERSIST_DIR,
+    # which only one process may use (job workers need a server)
+    CHROMA_HOST: str = os.getenv("CHROMA_HOST", "")
+    CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8000"))
     APP_HOST: str = os.getenv("APP_HOST", "0.0.0.0")
     APP_PORT: int = int(os.getenv("APP_PORT", "8000"))
 
+    # Shared HTTP connection pool for all LLM clients
+    LLM_POOL_MAX_CONNECTIONS: int = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+    LLM_POOL_MAX_KEEPALIVE: int = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+    LLM_POOL_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30"))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "60"))
+
+    # Embeddings: "openai" or "local" (on-CPU MiniLM), cached on disk by content hash
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "openai")
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./data/embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+    # Knowledge base retrieval: vector + BM25 candidates fused with reciprocal rank fusion
+    KB_TOP_K: int = int(os.getenv("KB_TOP_K", "3"))
+    KB_VECTOR_K: int = int(os.getenv("KB_VECTOR_K", "10"))
+    KB_LEXICAL_K: int = int(os.getenv("KB_LEXICAL_K", "10"))
+    KB_RRF_K: int = int(os.getenv("KB_RRF_K", "60"))
+    KB_HYBRID_ENABLED: bool = os.getenv("KB_HYBRID_ENABLED", "true").lower() == "true"
+    # BM25 index (SQLite); with CHROMA_HOST every process must see the same directory
+    KB_LEXICAL_DIR: str = os.getenv("KB_LEXICAL_DIR", "") or CHROMA_PERSIST_DIR
+
+    # Prompt token budgets for retrieved context (measured with tiktoken)
+    CONTEXT_BUDGET_EXECUTOR: int = int(os.getenv("CONTEXT_BUDGET_EXECUTOR", "2000"))
+    CONTEXT_BUDGET_RESPONDER: int = int(os.getenv("CONTEXT_BUDGET_RESPONDER", "4000"))
+    CONTEXT_BUDGET_HISTORY: int = int(os.getenv("CONTEXT_BUDGET_HISTORY", "1500"))
+
+    # Knowledge base ingestion: chunk sizes in characters, batch size in chunks
+    INGEST_CHUNK_SIZE: int = int(os.getenv("INGEST_CHUNK_SIZE", "1500"))
+    INGEST_CHUNK_OVERLAP: int = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    INGEST_CONCURRENCY: int = int(os.getenv("INGEST_CONCURRENCY", "4"))
+
+    # Graph run checkpoints (SQLite) so failed or cancelled runs can be resumed.
+    # Durability "exit" writes once when a run ends (including on error or cancellation);
+    # "async" / "sync" write after every step and also survive a process crash.
+    CHECKPOINT_ENABLED: bool = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+    CHECKPOINT_DB_PATH: str = os.getenv("CHECKPOINT_DB_PATH", "./data/checkpoints.sqlite3")
+    CHECKPOINT_DURABILITY: str = os.getenv("CHECKPOINT_DURABILITY", "exit")
+    CHECKPOINT_TTL: float = float(os.getenv("CHECKPOINT_TTL", "86400"))
+    CHECKPOINT_PRUNE_INTERVAL: float = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "3600"))
+
+    # Session memory: server-side history and retrieved documents per session_id
+    SESSION_TTL: float = float(os.getenv("SESSION_TTL", "3600"))
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+    SESSION_MAX_DOCUMENTS: int = int(os.getenv("SESSION_MAX_DOCUMENTS", "50"))
+    SESSION_KEEP_TURNS: int = int(os.getenv("SESSION_KEEP_TURNS", "3"))
+    SESSION_REUSE_THRESHOLD: float = float(os.getenv("SESSION_REUSE_THRESHOLD", "0.45"))
+    SESSION_REUSE_MAX_DOCS: int = int(os.getenv("SESSION_REUSE_MAX_DOCS", "3"))
+
+    # Batch chat endpoint: default and maximum items in flight, maximum items per JSON request
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+    # Background jobs: SQLite queue and worker processes started with the app (0 = run them
+    # separately with `python -m app.core.jobs`), each running several jobs concurrently.
+    # Workers are separate processes, so they need a Chroma server (CHROMA_HOST).
+    # A job still running after JOB_TIMEOUT seconds fails; a lost worker's job is retried.
+    JOB_DB_PATH: str = os.getenv("JOB_DB_PATH", "./data/jobs.sqlite3")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "0"))
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    JOB_RESULT_TTL: float = float(os.getenv("JOB_RESULT_TTL", "86400"))
+    JOB_TIMEOUT: float = float(os.getenv("JOB_TIMEOUT", "1800"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+    JOB_PRUNE_INTERVAL: float = float(os.getenv("JOB_PRUNE_INTERVAL", "600"))
+
+    # Identical concurrent chat requests share one in-flight graph run
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+
+    # Planner fast path: heuristic triage before the planner, in-memory cache of LLM plans
+    PLANNER_FAST_PATH_ENABLED: bool = os.getenv("PLANNER_FAST_PATH_ENABLED", "true").lower() == "true"
+    PLANNER_FAST_PATH_MAX_WORDS: int = int(os.getenv("PLANNER_FAST_PATH_MAX_WORDS", "12"))
+    PLAN_CACHE_ENABLED: bool = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+    PLAN_CACHE_TTL: float = float(os.getenv("PLAN_CACHE_TTL", "3600"))
+    PLAN_CACHE_MAX_ENTRIES: int = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "5000"))
+    # Start each sub-task's knowledge base hop as soon as the streaming planner emits it
+    PLAN_PREFETCH_ENABLED: bool = os.getenv("PLAN_PREFETCH_ENABLED", "true").lower() == "true"
+
+    # Semantic response cache in front of the graph
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL: float = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+    # Persistent memoization of deterministic (temperature 0) LLM calls
+    MEMO_ENABLED: bool = os.getenv("MEMO_ENABLED", "true").lower() == "true"
+    MEMO_AGENTS: set[str] = set(filter(None, os.getenv("MEMO_AGENTS", "planner,grader,rephraser,reviewer").split(",")))
+    MEMO_DB_PATH: str = os.getenv("MEMO_DB_PATH", "./data/llm_memo.sqlite3")
+    MEMO_MAX_ENTRIES: int = int(os.getenv("MEMO_MAX_ENTRIES", "50000"))
+
+    # Web search: "duckduckgo" or "fixture" (offline canned results)
+    WEB_SEARCH_BACKEND: str = os.getenv("WEB_SEARCH_BACKEND", "duckduckgo")
+    WEB_SEARCH_FIXTURE_PATH: str = os.getenv("WEB_SEARCH_FIXTURE_PATH", "")
+    WEB_SEARCH_CACHE_TTL: float = float(os.getenv("WEB_SEARCH_CACHE_TTL", "900"))
+    WEB_SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", "2000"))
+
+    # LLM scheduler: OpenAI account limits (0 = unlimited), wait-queue bounds, completion estimate
+    LLM_RPM_LIMIT: float = float(os.getenv("LLM_RPM_LIMIT", "500"))
+    LLM_TPM_LIMIT: float = float(os.getenv("LLM_TPM_LIMIT", "200000"))
+    LLM_QUEUE_MAX_DEPTH: int = int(os.getenv("LLM_QUEUE_MAX_DEPTH", "500"))
+    LLM_ADMISSION_QUEUE_DEPTH: int = int(os.getenv("LLM_ADMISSION_QUEUE_DEPTH", "200"))
+    LLM_EST_COMPLETION_TOKENS: int = int(os.getenv("LLM_EST_COMPLETION_TOKENS", "300"))
+
+    # Hard per-request deadline in seconds (0 disables) and client disconnect polling
+    REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "120"))
+    DISCONNECT_POLL_INTERVAL: float = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+    # Latency budget: expected step durations (ms) used until the step has been measured
+    BUDGET_SEARCH_MS: float = float(os.getenv("BUDGET_SEARCH_MS", "3000"))
+    BUDGET_WEB_HOP_MS: float = float(os.getenv("BUDGET_WEB_HOP_MS", "2500"))
+    BUDGET_FALLBACK_HOP_MS: float = float(os.getenv("BUDGET_FALLBACK_HOP_MS", "2500"))
+    BUDGET_EXECUTE_MS: float = float(os.getenv("BUDGET_EXECUTE_MS", "1500"))
+    BUDGET_RESPOND_MS: float = float(os.getenv("BUDGET_RESPOND_MS", "3000"))
+    BUDGET_REVIEW_MS: float = float(os.getenv("BUDGET_REVIEW_MS", "1500"))
+
+    # Cost estimation overrides: {"model": [usd_per_1M_prompt, usd_per_1M_completion]}
+    LLM_PRICES_JSON: str = os.getenv("LLM_PRICES_JSON", "")
+
+    # Relevance grading: "batch" grades a whole hop in one call, "concurrent" one call per doc
+    GRADER_MODE: str = os.getenv("GRADER_MODE", "batch")
+    GRADER_MAX_CONCURRENCY: int = int(os.getenv("GRADER_MAX_CONCURRENCY", "4"))
+    # Batch runs share grading calls: requests gathered over a window (ms), sent early at max docs
+    GRADER_SHARED_WINDOW_MS: float = float(os.getenv("GRADER_SHARED_WINDOW_MS", "25"))
+    GRADER_SHARED_MAX_DOCS: int = int(os.getenv("GRADER_SHARED_MAX_DOCS", "16"))
+
+    # Distance policy for KB hits (Chroma distances): accept below / reject above, LLM in between
+    GRADER_POLICY_ENABLED: bool = os.getenv("GRADER_POLICY_ENABLED", "true").lower() == "true"
+    GRADER_ACCEPT_DISTANCE: float = float(os.getenv("GRADER_ACCEPT_DISTANCE", "0.6"))
+    GRADER_REJECT_DISTANCE: float = float(os.getenv("GRADER_REJECT_DISTANCE", "1.5"))
+    GRADER_AUDIT_RATE: float = float(os.getenv("GRADER_AUDIT_RATE", "0.05"))
+    GRADER_DECISION_LOG: str = os.getenv("GRADER_DECISION_LOG", "./data/grader_decisions.jsonl")
+    GRADER_THRESHOLDS_PATH: str = os.getenv("GRADER_THRESHOLDS_PATH", "./data/grader_thresholds.json")
+    GRADER_CALIBRATION_PRECISION: float = float(os.getenv("GRADER_CALIBRATION_PRECISION", "0.95"))
+    GRADER_CALIBRATION_MIN_SAMPLES: int = int(os.getenv("GRADER_CALIBRATION_MIN_SAMPLES", "50"))
+
 
 settings = Settings()
@@ -0,0 +1,162 @@
+"""Context Manager: deduplicates, ranks and packs retrieved documents into prompts.
+
+Retrieved documents are stored once per content hash, tagged with every
+sub-task that retrieved them. Before a prompt is built, candidates are ranked
+by lexical relevance (BM25 over the candidate set) to the text at hand — the
+current sub-task for the executor, the user query for the responder — and
+packed greedily into a per-agent token budget measured with tiktoken.
+Conversation history is packed the same way, most recent turns first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from typing_extensions import TypedDict
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class ContextDocument(TypedDict, total=False):
+    hash: str
+    text: str
+    task_ids: list[int]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def make_documents(texts: list[str], task_id: int | None = None) -> list[ContextDocument]:
+    """Wrap retrieved texts as context documents owned by a sub-task."""
+    return [
+        {"hash": content_hash(text), "text": text, "task_ids": [task_id] if task_id is not None else []}
+        for text in texts
+    ]
+
+
+def merge_context(left: list[ContextDocument], right: list[ContextDocument]) -> list[ContextDocument]:
+    """Reducer for `context_documents`: one entry per content hash, task ids unioned."""
+    merged = list(left or [])
+    positions = {doc["hash"]: i for i, doc in enumerate(merged)}
+    for doc in right or []:
+        i = positions.get(doc["hash"])
+        if i is None:
+            positions[doc["hash"]] = len(merged)
+            merged.append(doc)
+        else:
+            task_ids = list(dict.fromkeys(merged[i].get("task_ids", []) + doc.get("task_ids", [])))
+            merged[i] = {**merged[i], "task_ids": task_ids}
+    return merged
+
+
+def _terms(text: str) -> list[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+
+def rank_documents(docs: list[ContextDocument], target: str, task_id: int | None = None) -> list[ContextDocument]:
+    """Order documents by BM25 relevance to `target`, best first.
+
+    Documents retrieved for `task_id` get a boost over ones from other tasks.
+    """
+    if len(docs) < 2:
+        return list(docs)
+
+    query_terms = set(_terms(target))
+    doc_terms = [Counter(_terms(doc["text"])) for doc in docs]
+    avg_len = sum(sum(c.values()) for c in doc_terms) / len(docs) or 1.0
+    df = Counter(term for counts in doc_terms for term in counts if term in query_terms)
+
+    def _score(i: int) -> float:
+        counts, length = doc_terms[i], sum(doc_terms[i].values())
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg_len))
+        if task_id is not None and task_id in docs[i].get("task_ids", []):
+            score = score * 1.5 + 1.0
+        return score
+
+    order = sorted(range(len(docs)), key=lambda i: (-_score(i), i))
+    return [docs[i] for i in order]
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """tiktoken encoding for `model`, or None if it cannot be loaded.
+
+    The failure is cached too: without network access tiktoken would retry
+    the encoding download on every call.
+    """
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as exc:
+        logger.warning("tiktoken unavailable (%s); estimating tokens from characters", exc)
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Token count for `model`; falls back to a chars/4 estimate if tiktoken is unavailable."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def _truncate(text: str, max_tokens: int, model: str) -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[: max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def pack_context(docs: list[ContextDocument], target: str, budget: int, model: str,
+                 task_id: int | None = None, separator: str = "\n---\n") -> str:
+    """Rank documents against `target` and join as many as fit in `budget` tokens.
+
+    The first document that does not fit is truncated to the remaining budget
+    when a meaningful amount (over 64 tokens) is left.
+    """
+    parts: list[str] = []
+    remaining = budget
+    sep_tokens = count_tokens(separator, model)
+
+    for doc in rank_documents(docs, target, task_id):
+        cost = count_tokens(doc["text"], model) + (sep_tokens if parts else 0)
+        if cost <= remaining:
+            parts.append(doc["text"])
+            remaining -= cost
+            continue
+        if remaining > 64:
+            parts.append(_truncate(doc["text"], remaining - sep_tokens, model))
+        break
+
+    return separator.join(parts)
+
+
+def pack_history(history: list[dict[str, str]], budget: int, model: str) -> str:
+    """Render chat history as "Role: content" lines, keeping the most recent that fit in `budget` tokens."""
+    lines: list[str] = []
+    remaining = budget
+    for message in reversed(history):
+        line = f"{message.get('role', 'user').capitalize()}: {message.get('content', '')}"
+        cost = count_tokens(line, model) + 1
+        if cost > remaining:
+            break
+        lines.append(line)
+        remaining -= cost
+    return "\n".join(reversed(lines))
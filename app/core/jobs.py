@@ -0,0 +1,386 @@
+"""Background Jobs: durable queue and worker processes for long graph runs.
+
+`POST /api/jobs` stores the request in a local SQLite queue and returns a
+job id at once, so long multi-task runs hold neither a uvicorn worker nor
+the client connection; the client polls the job and fetches its result,
+which is kept for JOB_RESULT_TTL seconds.
+
+Jobs are executed by a pool of separate worker processes (run on their own
+with `python -m app.core.jobs`, or JOB_WORKERS started with the app),
+each running up to JOB_WORKER_CONCURRENCY graph runs at a time, so graph
+execution scales across cores independently of HTTP serving. Workers claim
+the highest-priority, oldest queued job. A claim is a lease: if a worker
+dies, its job is claimed again once the lease (JOB_TIMEOUT plus a grace
+period) runs out — resuming from the run's checkpoint when there is one —
+and fails after JOB_MAX_ATTEMPTS attempts. A worker asked to stop puts its
+unfinished jobs back in the queue.
+
+Each process runs its own graph, caches and LLM scheduler; LLM rate limits
+are per process. The embedded Chroma store cannot be shared between
+processes, so workers need the knowledge base on a Chroma server
+(CHROMA_HOST). Session memory is per process too: a session's history and
+documents travel with the job, and the API records the turn in the session
+when it reads the finished job.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any
+
+from app.core.budget import deadline_from
+from app.core.checkpoints import new_run_id, run_checkpointer, run_config
+from app.core.config import settings
+from app.core.llm import aclose_clients
+from app.core.metrics import start_run
+from app.core.scheduler import SchedulerSaturated
+
+logger = logging.getLogger(__name__)
+
+# Extra lease time past JOB_TIMEOUT before a running job counts as abandoned
+_LEASE_GRACE = 60.0
+
+# Final-state fields kept as the job result (what ChatResponse is built from)
+_RESULT_KEYS = (
+    "final_response", "draft_response", "plan", "search_queries",
+    "tool_results", "review_passed", "review_feedback",
+)
+
+
+class JobQueue:
+    """SQLite-backed priority queue of graph runs and their results."""
+
+    def __init__(self, path: str, result_ttl: float, timeout: float, max_attempts: int):
+        self.path = path
+        self.result_ttl = result_ttl
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit; claim() opens its own write transaction
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT, priority INTEGER, request TEXT,"
+                " result TEXT, error TEXT, run_id TEXT, attempts INTEGER DEFAULT 0,"
+                " created_at REAL, started_at REAL, finished_at REAL, lease_until REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at)")
+        return self._conn
+
+    def submit(self, request: dict[str, Any], priority: int = 0) -> str:
+        """Queue a graph run; higher `priority` runs first. Returns the job id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO jobs (id, status, priority, request, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, priority, json.dumps(request, ensure_ascii=False), time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """Status of a job, with its queue position while queued and its result once done."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT status, priority, result, error, run_id, attempts, created_at, started_at, finished_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            status, priority, result, error, run_id, attempts, created_at, started_at, finished_at = row
+            position = None
+            if status == "queued":
+                position = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+                    " AND (priority > ? OR (priority = ? AND created_at < ?))",
+                    (priority, priority, created_at),
+                ).fetchone()[0]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "priority": priority,
+            "position": position,
+            "attempts": attempts,
+            "run_id": run_id,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "result": json.loads(result) if result else None,
+        }
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a job that has not started yet."""
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM jobs WHERE id = ? AND status = 'queued'", (job_id,))
+        return cursor.rowcount > 0
+
+    def claim(self) -> tuple[str, dict[str, Any], str, int] | None:
+        """Lease the next job: (job id, request, run id, attempt), or None if the queue is empty."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker lost; attempts exhausted.', finished_at = ?"
+                    " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                # A queued job's lease_until is its backoff after being released
+                row = conn.execute(
+                    "SELECT id, request, run_id, attempts FROM jobs"
+                    " WHERE (status = 'queued' AND (lease_until IS NULL OR lease_until <= ?))"
+                    " OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY priority DESC, created_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                job_id, request, run_id, attempts = row
+                # A re-claimed job keeps its run id, so it resumes from the run's checkpoint
+                run_id = run_id or new_run_id()
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, run_id = ?,"
+                    " started_at = ?, lease_until = ? WHERE id = ?",
+                    (run_id, now, now + self.timeout + _LEASE_GRACE, job_id),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id, json.loads(request), run_id, attempts + 1
+
+    def finish(self, job_id: str, result: dict[str, Any]) -> None:
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def release(self, job_id: str, delay: float = 0.0) -> None:
+        """Put a job back in the queue, claimable again after `delay` seconds.
+
+        E.g. when its worker shuts down or the LLM scheduler is saturated;
+        the attempt does not count towards JOB_MAX_ATTEMPTS.
+        """
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_until = ?"
+                " WHERE id = ? AND status = 'running'",
+                (time.time() + delay if delay > 0 else None, job_id),
+            )
+
+    def prune(self) -> int:
+        """Delete finished jobs older than the result TTL; returns how many were removed."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - self.result_ttl,),
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {
+            **{status: 0 for status in ("queued", "running", "done", "failed")},
+            **dict(rows),
+            "workers": settings.JOB_WORKERS,
+            "worker_concurrency": settings.JOB_WORKER_CONCURRENCY,
+        }
+
+
+job_queue = JobQueue(
+    path=settings.JOB_DB_PATH,
+    result_ttl=settings.JOB_RESULT_TTL,
+    timeout=settings.JOB_TIMEOUT,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+)
+
+
+async def _run_job(job_id: str, request: dict[str, Any], run_id: str, attempt: int) -> None:
+    from app.agents.searcher import retrieval_prefetch
+    from app.graph import mas_graph
+
+    start = time.perf_counter()
+    run = start_run()
+    config = run_config(run_id)
+    state: dict[str, Any] | None = {
+        "query": request["query"],
+        "chat_history": request.get("chat_history", []),
+        "session_documents": request.get("session_documents", []),
+        # The latency budget starts when the job does, not when it was queued
+        "deadline": deadline_from(request.get("max_latency_ms")),
+        "revision_count": 0,
+    }
+    try:
+        if attempt > 1 and settings.CHECKPOINT_ENABLED:
+            snapshot = await mas_graph.aget_state(config)
+            if snapshot.next:
+                logger.info("Resuming job %s from run %s", job_id, run_id)
+                state = None
+
+        result = await asyncio.wait_for(
+            mas_graph.ainvoke(state, config, durability=settings.CHECKPOINT_DURABILITY),
+            settings.JOB_TIMEOUT,
+        )
+    except asyncio.CancelledError:
+        # Shielded: the stopping worker must still hand the job back
+        await asyncio.shield(asyncio.to_thread(job_queue.release, job_id))
+        raise
+    except TimeoutError:
+        await asyncio.to_thread(job_queue.fail, job_id, "Job timed out.")
+        return
+    except SchedulerSaturated as exc:
+        # Not the job's fault: back off and let any worker pick it up again
+        logger.info("Job %s deferred %.0fs: LLM scheduler saturated", job_id, exc.retry_after)
+        await asyncio.to_thread(job_queue.release, job_id, max(exc.retry_after, settings.JOB_POLL_INTERVAL))
+        return
+    except Exception as exc:
+        logger.exception("Job %s failed", job_id)
+        await asyncio.to_thread(job_queue.fail, job_id, str(exc))
+        return
+    finally:
+        retrieval_prefetch.discard(run_id)
+
+    # Session jobs hand their turn back for the API to record in the session
+    keys = (*_RESULT_KEYS, "query", "context_documents") if request.get("session_id") else _RESULT_KEYS
+    await asyncio.to_thread(job_queue.finish, job_id, {
+        "state": {key: result[key] for key in keys if key in result},
+        "session_id": request.get("session_id"),
+        "elapsed_ms": int((time.perf_counter() - start) * 1000),
+        "metrics": run.summary() if request.get("include_metrics") else None,
+    })
+
+
+async def work(concurrency: int, stop: asyncio.Event) -> None:
+    """Claim and run jobs, at most `concurrency` at a time, until `stop` is set.
+
+    Jobs still running when stopping are cancelled and put back in the queue.
+    """
+    running: set[asyncio.Task] = set()
+    last_prune = 0.0
+    try:
+        while not stop.is_set():
+            # SQLite may wait on the queue's write lock; the loop keeps running the other jobs
+            job = await asyncio.to_thread(job_queue.claim) if len(running) < concurrency else None
+            if job is not None:
+                task = asyncio.ensure_future(_run_job(*job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                continue
+
+            if time.monotonic() - last_prune >= settings.JOB_PRUNE_INTERVAL:
+                last_prune = time.monotonic()
+                await asyncio.to_thread(job_queue.prune)
+
+            # Poll again after the interval, or as soon as a slot frees up
+            stopping = asyncio.ensure_future(stop.wait())
+            await asyncio.wait(
+                {stopping, *running}, timeout=settings.JOB_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+            )
+            stopping.cancel()
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def _serve(concurrency: int) -> None:
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await work(concurrency, stop)
+    finally:
+        await aclose_clients()
+        await run_checkpointer.aclose()
+
+
+def _worker_main(concurrency: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(processName)s %(name)s: %(message)s")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(concurrency))
+
+
+class JobWorkerPool:
+    """Worker processes executing queued jobs."""
+
+    def __init__(self, workers: int, concurrency: int):
+        self.workers = workers
+        self.concurrency = concurrency
+        self._processes: list[BaseProcess] = []
+
+    def start(self) -> None:
+        if self.workers and not settings.CHROMA_HOST:
+            logger.warning(
+                "Job workers open the embedded Chroma store in %s alongside other processes, which is "
+                "unsupported (concurrent writes, stale index); set CHROMA_HOST to a Chroma server",
+                settings.CHROMA_PERSIST_DIR,
+            )
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            process = context.Process(
+                target=_worker_main, args=(self.concurrency,), name=f"job-worker-{index}", daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        if self._processes:
+            logger.info("Started %d job workers", len(self._processes))
+
+    def join(self) -> None:
+        for process in self._processes:
+            process.join()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ask the workers to put their jobs back and exit; kill any that do not in time."""
+        for process in self._processes:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(deadline - time.monotonic(), 0.0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._processes.clear()
+
+
+job_workers = JobWorkerPool(workers=settings.JOB_WORKERS, concurrency=settings.JOB_WORKER_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    # Standalone worker pool, for running graph execution apart from the API (JOB_WORKERS=0 there)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    pool = JobWorkerPool(workers=max(settings.JOB_WORKERS, 1), concurrency=settings.JOB_WORKER_CONCURRENCY)
+    pool.start()
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
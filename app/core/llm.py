@@ -0,0 +1,120 @@
+"""LLM client registry: shared, pooled ChatOpenAI instances for all agents.
+
+Agents ask for a client by role instead of constructing ChatOpenAI on every
+call. Clients are cached per (model, temperature, role) and all of them share
+one sync and one async httpx client, so HTTP connections and TLS sessions to
+the OpenAI API are kept alive and reused across requests.
+
+`set_llm_factory` swaps ChatOpenAI for another chat model class (the offline
+benchmarks use a deterministic fake) without touching the agents.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+
+from app.core.config import settings
+from app.core.metrics import metrics_callback
+
+_clients: dict[tuple[str, float, str], BaseChatModel] = {}
+_lock = threading.Lock()
+_factory: Callable[..., BaseChatModel] | None = None
+
+_http_client: httpx.Client | None = None
+_http_async_client: httpx.AsyncClient | None = None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _get_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    global _http_client, _http_async_client
+
+    if _http_client is None:
+        _http_client = httpx.Client(limits=_pool_limits(), timeout=settings.LLM_TIMEOUT)
+    if _http_async_client is None:
+        _http_async_client = httpx.AsyncClient(limits=_pool_limits(), timeout=settings.LLM_TIMEOUT)
+
+    return _http_client, _http_async_client
+
+
+def _build_client(model: str, temperature: float, role: str) -> BaseChatModel:
+    if _factory is not None:
+        return _factory(
+            model=model,
+            temperature=temperature,
+            metadata={"agent_role": role},
+            callbacks=[metrics_callback],
+        )
+
+    http_client, http_async_client = _get_http_clients()
+    return ChatOpenAI(
+        model=model,
+        api_key=settings.OPENAI_API_KEY,
+        temperature=temperature,
+        timeout=settings.LLM_TIMEOUT,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        metadata={"agent_role": role},
+        callbacks=[metrics_callback],
+        stream_usage=True,
+    )
+
+
+def set_llm_factory(factory: Callable[..., BaseChatModel] | None) -> None:
+    """Build agent clients with `factory` instead of ChatOpenAI (None restores it).
+
+    The factory is called with the keyword arguments `model`, `temperature`,
+    `metadata` and `callbacks`, and must return a chat model exposing
+    `model_name` and `temperature`. Already-built clients are dropped.
+    """
+    global _factory
+
+    with _lock:
+        _factory = factory
+        _clients.clear()
+
+
+def get_llm(role: str, temperature: float, model: str | None = None) -> BaseChatModel:
+    """Return the shared chat client for an agent role.
+
+    `role` names the calling agent ("planner", "grader", "executor", ...) and
+    is attached as run metadata so the metrics callback can attribute latency,
+    tokens and cost to the calling agent.
+    """
+    model = model or settings.OPENAI_MODEL
+    key = (model, temperature, role)
+
+    llm = _clients.get(key)
+    if llm is not None:
+        return llm
+
+    with _lock:
+        if key not in _clients:
+            _clients[key] = _build_client(model, temperature, role)
+        return _clients[key]
+
+
+async def aclose_clients() -> None:
+    """Close the pooled HTTP connections (call on application shutdown)."""
+    global _http_client, _http_async_client
+
+    with _lock:
+        _clients.clear()
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+
+    if http_client is not None:
+        http_client.close()
+    if http_async_client is not None:
+        await http_async_client.aclose()
@@ -0,0 +1,180 @@
+"""LLM Memo: persistent exact-match memoization of deterministic LLM calls.
+
+The planner, grader, rephraser and reviewer run at temperature 0, so the
+same prompt yields the same answer. Replies are stored in a local SQLite file
+keyed by a hash of (model, temperature, messages); repeats are served from
+disk without an API call. The store is bounded: once it exceeds
+MEMO_MAX_ENTRIES the least recently used entries are evicted. Lookups and
+writes run in a worker thread so SQLite never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from langchain_openai import ChatOpenAI
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.core.scheduler import ainvoke_llm, astream_llm
+
+logger = logging.getLogger(__name__)
+
+
+class LLMMemo:
+    """SQLite-backed prompt-hash → completion store with LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS memo ("
+                " key TEXT PRIMARY KEY, role TEXT, content TEXT,"
+                " created_at REAL, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS memo_last_used ON memo (last_used)")
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: list[dict[str, str]]) -> str:
+        blob = json.dumps(
+            {"model": model, "temperature": temperature, "messages": messages},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT content FROM memo WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                record_cache("llm_memo", hit=False)
+                return None
+            conn.execute("UPDATE memo SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self._hits += 1
+            record_cache("llm_memo", hit=True)
+            return row[0]
+
+    def put(self, key: str, role: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO memo (key, role, content, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, role, content, now, now),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM memo").fetchone()
+            if count > self.max_entries:
+                # Evict down to 90% so we don't pay for eviction on every insert
+                excess = count - int(self.max_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM memo WHERE key IN (SELECT key FROM memo ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM memo")
+            conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            (count,) = self._connect().execute("SELECT COUNT(*) FROM memo").fetchone()
+        lookups = self._hits + self._misses
+        return {
+            "entries": count,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "agents": sorted(settings.MEMO_AGENTS),
+        }
+
+
+llm_memo = LLMMemo(path=settings.MEMO_DB_PATH, max_entries=settings.MEMO_MAX_ENTRIES)
+
+
+async def memo_ainvoke(llm: ChatOpenAI, messages: list[dict[str, str]]) -> str:
+    """Invoke the LLM and return the reply text, memoized when allowed.
+
+    Only temperature-0 clients of agents listed in MEMO_AGENTS are memoized;
+    every other call goes straight to the model.
+    """
+    if not _memoizable(llm):
+        response = await ainvoke_llm(llm, messages)
+        return response.content
+
+    key = LLMMemo.make_key(llm.model_name, llm.temperature, messages)
+    content = await _memo_get(key)
+    if content is not None:
+        return content
+
+    response = await ainvoke_llm(llm, messages)
+    await _memo_put(key, llm, response.content)
+    return response.content
+
+
+async def memo_astream(llm: ChatOpenAI, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+    """Stream the reply text piece by piece, memoized like `memo_ainvoke`.
+
+    A memoized reply is yielded whole; a fresh one is stored once it has
+    streamed completely.
+    """
+    key = LLMMemo.make_key(llm.model_name, llm.temperature, messages) if _memoizable(llm) else None
+    if key is not None:
+        content = await _memo_get(key)
+        if content is not None:
+            yield content
+            return
+
+    pieces: list[str] = []
+    async for chunk in astream_llm(llm, messages):
+        if isinstance(chunk.content, str) and chunk.content:
+            pieces.append(chunk.content)
+            yield chunk.content
+
+    if key is not None:
+        await _memo_put(key, llm, "".join(pieces))
+
+
+def _memoizable(llm: ChatOpenAI) -> bool:
+    role = (llm.metadata or {}).get("agent_role", "")
+    return settings.MEMO_ENABLED and role in settings.MEMO_AGENTS and not llm.temperature
+
+
+async def _memo_get(key: str) -> str | None:
+    try:
+        return await asyncio.to_thread(llm_memo.get, key)
+    except sqlite3.Error as exc:
+        logger.warning("LLM memo lookup failed: %s", exc)
+        return None
+
+
+async def _memo_put(key: str, llm: ChatOpenAI, content: str) -> None:
+    try:
+        await asyncio.to_thread(llm_memo.put, key, (llm.metadata or {}).get("agent_role", ""), content)
+    except sqlite3.Error as exc:
+        logger.warning("LLM memo write failed: %s", exc)
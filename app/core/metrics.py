@@ -0,0 +1,316 @@
+"""Metrics: per-node and per-LLM-call latency, tokens, cost and cache hits.
+
+Process-wide counters and histograms are rendered in the Prometheus text
+format at /api/metrics. LLM calls are observed by a LangChain callback
+handler attached to every shared client; graph nodes are timed by the
+`instrument` wrapper used in build_graph. When a request opts in, the same
+observations are also collected into a RunMetrics summary for that run only
+(tracked through a context variable, so concurrent runs stay separate).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core.config import settings
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# USD per 1M (prompt, completion) tokens
+_DEFAULT_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+def _label_key(labels: dict[str, str]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple[tuple[str, str], ...], extra: dict[str, str] | None = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = _LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[key] += value
+
+    def mean(self, **labels: str) -> float | None:
+        """Mean observed value for the label set, or None before any observation."""
+        key = _label_key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            return self._sums[key] / counts[-1] if counts else None
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': f'{bound:g}'})} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {counts[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {self._sums[key]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {counts[-1]}")
+        return lines
+
+
+request_latency = Histogram("mas_request_latency_seconds", "End-to-end latency of API requests.")
+requests_total = Counter("mas_requests_total", "API requests by endpoint and outcome.")
+coalesced_requests = Counter("mas_coalesced_requests_total", "Requests served by attaching to an identical in-flight run.")
+cancellations = Counter("mas_cancellations_total", "Graph runs cancelled before completion, by reason.")
+node_latency = Histogram("mas_node_latency_seconds", "Latency of each graph node execution.")
+search_hop_latency = Histogram("mas_search_hop_latency_seconds", "Latency of each search hop (kb/web/fallback).")
+plan_routes = Counter("mas_plan_routes_total", "How each query got its plan (direct/single/cached/llm).")
+budget_skips = Counter("mas_budget_skips_total", "Graph steps skipped to stay within a request's latency budget.")
+llm_latency = Histogram("mas_llm_call_latency_seconds", "Latency of each LLM call.")
+llm_calls = Counter("mas_llm_calls_total", "LLM calls by agent role and model.")
+llm_tokens = Counter("mas_llm_tokens_total", "LLM tokens by agent role, model and kind (prompt/completion).")
+llm_cost = Counter("mas_llm_cost_usd_total", "Estimated LLM cost in USD by agent role and model.")
+cache_requests = Counter("mas_cache_requests_total", "Cache lookups by cache and result (hit/miss).")
+llm_queue_depth = Gauge("mas_llm_queue_depth", "LLM calls waiting for rate-limit capacity.")
+llm_queue_wait = Histogram("mas_llm_queue_wait_seconds", "Time LLM calls waited in the scheduler, by agent role.")
+admission_rejections = Counter("mas_admission_rejections_total", "Requests turned away with 429 while the LLM queue was saturated.")
+
+_ALL = [
+    request_latency, requests_total, coalesced_requests, cancellations, admission_rejections,
+    node_latency, search_hop_latency, plan_routes, budget_skips,
+    llm_latency, llm_calls, llm_tokens, llm_cost, llm_queue_depth, llm_queue_wait,
+    cache_requests,
+]
+
+
+def render_prometheus() -> str:
+    return "\n".join(line for metric in _ALL for line in metric.render()) + "\n"
+
+
+class RunMetrics:
+    """Observations of a single graph run, attached to its response on request."""
+
+    def __init__(self):
+        self.nodes: dict[str, dict[str, float]] = defaultdict(lambda: {"calls": 0, "total_ms": 0.0})
+        self.llm: dict[str, dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "total_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        )
+        self.cache: dict[str, dict[str, int]] = defaultdict(lambda: {"hit": 0, "miss": 0})
+
+    def summary(self) -> dict[str, Any]:
+        llm_totals = {
+            key: round(sum(role[key] for role in self.llm.values()), 6)
+            for key in ("calls", "prompt_tokens", "completion_tokens", "cost_usd")
+        }
+        return {
+            "nodes": {name: {**v, "total_ms": round(v["total_ms"], 1)} for name, v in self.nodes.items()},
+            "llm": {**llm_totals, "by_role": {role: {**v, "total_ms": round(v["total_ms"], 1)}
+                                              for role, v in self.llm.items()}},
+            "cache": dict(self.cache),
+        }
+
+
+_current_run: contextvars.ContextVar[RunMetrics | None] = contextvars.ContextVar("mas_run_metrics", default=None)
+
+
+def start_run() -> RunMetrics:
+    """Begin collecting observations for the current request's graph run."""
+    run = RunMetrics()
+    _current_run.set(run)
+    return run
+
+
+def record_cache(cache: str, hit: bool, count: int = 1) -> None:
+    if count <= 0:
+        return
+    result = "hit" if hit else "miss"
+    cache_requests.inc(count, cache=cache, result=result)
+    run = _current_run.get()
+    if run is not None:
+        run.cache[cache][result] += count
+
+
+def record_request(endpoint: str, outcome: str, seconds: float) -> None:
+    request_latency.observe(seconds, endpoint=endpoint)
+    requests_total.inc(endpoint=endpoint, outcome=outcome)
+
+
+def record_cancellation(endpoint: str, reason: str) -> None:
+    """Count a graph run aborted because the client disconnected or the deadline passed."""
+    cancellations.inc(endpoint=endpoint, reason=reason)
+
+
+def record_node(node: str, seconds: float) -> None:
+    node_latency.observe(seconds, node=node)
+    run = _current_run.get()
+    if run is not None:
+        run.nodes[node]["calls"] += 1
+        run.nodes[node]["total_ms"] += seconds * 1000
+
+
+def _prices() -> dict[str, tuple[float, float]]:
+    prices = dict(_DEFAULT_PRICES)
+    if settings.LLM_PRICES_JSON:
+        prices.update({k: tuple(v) for k, v in json.loads(settings.LLM_PRICES_JSON).items()})
+    return prices
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = _prices()
+    # Dated snapshots ("gpt-4o-mini-2024-07-18") fall back to their base model
+    match = max((name for name in prices if model.startswith(name)), key=len, default=None)
+    if match is None:
+        return 0.0
+    prompt_price, completion_price = prices[match]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def record_llm_call(role: str, model: str, seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    llm_latency.observe(seconds, role=role, model=model)
+    llm_calls.inc(role=role, model=model)
+    llm_tokens.inc(prompt_tokens, role=role, model=model, kind="prompt")
+    llm_tokens.inc(completion_tokens, role=role, model=model, kind="completion")
+    llm_cost.inc(cost, role=role, model=model)
+
+    run = _current_run.get()
+    if run is not None:
+        stats = run.llm[role]
+        stats["calls"] += 1
+        stats["total_ms"] += seconds * 1000
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["cost_usd"] += cost
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times every chat model call and records its token usage and cost."""
+
+    # Run in the event loop thread so the per-run context variable is visible
+    run_inline = True
+
+    def __init__(self):
+        self._started: dict[UUID, tuple[float, str, str]] = {}
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, *, run_id: UUID,
+                            metadata: dict[str, Any] | None = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or (kwargs.get("invocation_params") or {}).get("model", "unknown")
+        self._started[run_id] = (time.perf_counter(), metadata.get("agent_role", "unknown"), model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, role, model = started
+
+        prompt_tokens = completion_tokens = 0
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        else:
+            # Streamed calls report usage on the message instead
+            for generations in response.generations:
+                for generation in generations:
+                    meta = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += meta.get("input_tokens", 0)
+                    completion_tokens += meta.get("output_tokens", 0)
+
+        record_llm_call(role, model, time.perf_counter() - start, prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+def instrument(node: str, fn: Callable) -> Callable:
+    """Wrap a graph node so each execution is timed under `node`."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            start = time.perf_counter()
+            try:
+                return await fn(state)
+            finally:
+                record_node(node, time.perf_counter() - start)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return fn(state)
+        finally:
+            record_node(node, time.perf_counter() - start)
+
+    return wrapper
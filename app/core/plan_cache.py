@@ -0,0 +1,75 @@
+"""Plan Cache: reuses the planner's decomposition of recently seen queries.
+
+Plans depend only on the query text, so they are kept in an in-memory LRU
+keyed by the normalized query (case and whitespace folded) with a TTL. This
+catches repeats the exact-match LLM memo misses and skips the memo's disk
+lookup on the hot path. Only plans the LLM actually produced are stored;
+fallback plans from unparseable replies are not.
+"""
+
+from __future__ import annotations
+
+import copy
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class PlanCache:
+    """In-memory LRU of (normalized query → plan) with TTL."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # normalized query → (plan, stored_at)
+        self._entries: OrderedDict[str, tuple[list[dict[str, Any]], float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, query: str) -> list[dict[str, Any]] | None:
+        """A fresh copy of the cached plan for `query`, or None."""
+        key = _normalize(query)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] < time.monotonic() - self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+
+        record_cache("plan", hit=entry is not None)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return copy.deepcopy(entry[0])
+
+    def put(self, query: str, plan: list[dict[str, Any]]) -> None:
+        key = _normalize(query)
+        self._entries[key] = (copy.deepcopy(plan), time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+
+
+plan_cache = PlanCache(ttl_seconds=settings.PLAN_CACHE_TTL, max_entries=settings.PLAN_CACHE_MAX_ENTRIES)
@@ -0,0 +1,220 @@
+"""LLM scheduler: rate-limit aware admission for every agent LLM call.
+
+All agent calls go through `ainvoke_llm` (or `astream_llm`), which waits for capacity in two
+token buckets sized to the OpenAI account limits — requests per minute and
+(estimated) tokens per minute — instead of letting bursts hit 429s and
+client-side retries. Waiting calls are served by priority: the interactive
+final answer (responder) first, background grading last. The wait queue is
+bounded; when it is full the call fails fast with SchedulerSaturated, and
+`admission_retry_after` lets the API turn new requests away with a 429
+while the queue is deep. Estimates are settled against the reported usage
+once a call returns.
+
+Limits are per process and assume a single event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Any, AsyncIterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+
+from app.core.config import settings
+from app.core.metrics import admission_rejections, llm_queue_depth, llm_queue_wait
+
+# Lower is served first
+PRIORITIES = {
+    "responder": 0,
+    "reviewer": 1,
+    "planner": 1,
+    "executor": 2,
+    "rephraser": 3,
+    "grader": 4,
+}
+DEFAULT_PRIORITY = 2
+
+
+class SchedulerSaturated(Exception):
+    """The LLM wait queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM scheduler saturated; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute; 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (requests above capacity wait for a full bucket)."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Consume `amount` (negative gives units back); may go into debt."""
+        if self.rate:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class LLMScheduler:
+    def __init__(self, rpm: float, tpm: float, max_queue: int, admission_depth: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue = max_queue
+        self.admission_depth = admission_depth
+        self._queue: list[tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _wait_time(self, tokens: float) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def _take(self, tokens: float) -> None:
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def _pump(self) -> None:
+        """Release queued calls in priority order while the buckets allow it."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = self._wait_time(tokens)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+                break
+            heapq.heappop(self._queue)
+            self._take(tokens)
+            future.set_result(None)
+
+        llm_queue_depth.set(len(self._queue))
+
+    async def acquire(self, role: str, tokens: float) -> None:
+        """Wait until a call of `tokens` estimated tokens may be sent."""
+        if not self._queue and self._wait_time(tokens) == 0:
+            self._take(tokens)
+            llm_queue_wait.observe(0.0, role=role)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            raise SchedulerSaturated(self.retry_after())
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES.get(role, DEFAULT_PRIORITY), next(self._seq), tokens, future)
+        heapq.heappush(self._queue, entry)
+        self._pump()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            self._pump()
+            raise
+        finally:
+            llm_queue_wait.observe(time.perf_counter() - start, role=role)
+
+    def settle(self, estimated: float, actual: float) -> None:
+        """Correct the token bucket once the real usage of a call is known."""
+        self.tokens.take(actual - estimated)
+
+    def retry_after(self) -> float:
+        """Rough seconds until the current queue has drained."""
+        queued_tokens = sum(entry[2] for entry in self._queue)
+        waits = [self._wait_time(0)]
+        if self.requests.rate:
+            waits.append(len(self._queue) / self.requests.rate)
+        if self.tokens.rate:
+            waits.append(queued_tokens / self.tokens.rate)
+        return max(1.0, math.ceil(max(waits)))
+
+    def admission_retry_after(self) -> float | None:
+        """Retry-After seconds if new requests should be turned away now, else None."""
+        if len(self._queue) < self.admission_depth:
+            return None
+        admission_rejections.inc()
+        return self.retry_after()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "admission_depth": self.admission_depth,
+            "requests_available": round(self.requests.tokens, 1) if self.requests.rate else None,
+            "tokens_available": round(self.tokens.tokens) if self.tokens.rate else None,
+        }
+
+
+llm_scheduler = LLMScheduler(
+    rpm=settings.LLM_RPM_LIMIT,
+    tpm=settings.LLM_TPM_LIMIT,
+    max_queue=settings.LLM_QUEUE_MAX_DEPTH,
+    admission_depth=settings.LLM_ADMISSION_QUEUE_DEPTH,
+)
+
+
+def estimate_tokens(messages: list[dict[str, str]] | list[BaseMessage]) -> int:
+    """Prompt tokens (≈ chars / 4) plus the expected completion length."""
+    chars = sum(
+        len(str(m.get("content", "") if isinstance(m, dict) else m.content))
+        for m in messages
+    )
+    return chars // 4 + settings.LLM_EST_COMPLETION_TOKENS
+
+
+async def ainvoke_llm(llm: BaseChatModel, messages: list[dict[str, str]]) -> BaseMessage:
+    """Invoke an agent LLM once the scheduler admits the call."""
+    role = (llm.metadata or {}).get("agent_role", "")
+    estimate = estimate_tokens(messages)
+
+    await llm_scheduler.acquire(role, estimate)
+    response = await llm.ainvoke(messages)
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        llm_scheduler.settle(estimate, usage.get("total_tokens", estimate))
+    return response
+
+
+async def astream_llm(llm: BaseChatModel, messages: list[dict[str, str]]) -> AsyncIterator[BaseMessageChunk]:
+    """Stream an agent LLM reply once the scheduler admits the call."""
+    role = (llm.metadata or {}).get("agent_role", "")
+    estimate = estimate_tokens(messages)
+
+    await llm_scheduler.acquire(role, estimate)
+    total = None
+    async for chunk in llm.astream(messages):
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            total = usage.get("total_tokens", total)
+        yield chunk
+
+    if total is not None:
+        llm_scheduler.settle(estimate, total)
@@ -0,0 +1,144 @@
+"""Semantic Response Cache: answers repeated and near-duplicate queries instantly.
+
+Sits in front of the graph. The incoming query is embedded and compared
+(cosine similarity) with the queries of earlier answers; a close enough
+match returns the stored response without running any agent. Entries expire
+after a TTL, the least recently used ones are evicted beyond a size bound,
+and the whole cache is dropped when the knowledge base changes.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+from app.tools.embeddings import aembed_texts
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SemanticCache:
+    """In-memory LRU of (query embedding → response payload) with TTL."""
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # normalized query → (unit embedding, payload, stored_at)
+        self._entries: OrderedDict[str, tuple[np.ndarray, dict[str, Any], float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for key in [k for k, (_, _, stored_at) in self._entries.items() if stored_at < cutoff]:
+            del self._entries[key]
+
+    def get_exact(self, query: str) -> dict[str, Any] | None:
+        """Cheap lookup by normalized text, before paying for an embedding."""
+        self._expire()
+        key = normalize_query(query)
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return self._entries[key][1]
+
+    def get_similar(self, embedding: list[float]) -> dict[str, Any] | None:
+        """Return the payload of the most similar cached query above the threshold."""
+        self._expire()
+        if not self._entries:
+            self._misses += 1
+            return None
+
+        keys = list(self._entries)
+        matrix = np.stack([self._entries[k][0] for k in keys])
+        scores = matrix @ _unit(embedding)
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(keys[best])
+        self._hits += 1
+        return self._entries[keys[best]][1]
+
+    def put(self, query: str, embedding: list[float], payload: dict[str, Any]) -> None:
+        key = normalize_query(query)
+        self._entries[key] = (_unit(embedding), payload, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self._invalidations,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
+
+
+def _unit(vector: list[float]) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm else arr
+
+
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+)
+
+
+async def lookup_response(query: str) -> tuple[dict[str, Any] | None, list[float] | None]:
+    """Return (cached payload or None, query embedding for a later `store_response`)."""
+    payload = semantic_cache.get_exact(query)
+    if payload is not None:
+        record_cache("semantic", hit=True)
+        return payload, None
+
+    try:
+        embedding = (await aembed_texts([query]))[0]
+    except Exception as exc:
+        logger.warning("Semantic cache embedding failed: %s", exc)
+        record_cache("semantic", hit=False)
+        return None, None
+
+    payload = semantic_cache.get_similar(embedding)
+    record_cache("semantic", hit=payload is not None)
+    return payload, embedding
+
+
+async def store_response(query: str, payload: dict[str, Any], embedding: list[float] | None = None) -> None:
+    """Cache a response payload under the query (embedding it if needed)."""
+    try:
+        if embedding is None:
+            embedding = (await aembed_texts([query]))[0]
+    except Exception as exc:
+        logger.warning("Semantic cache embedding failed: %s", exc)
+        return
+
+    semantic_cache.put(query, embedding, payload)
@@ -0,0 +1,181 @@
+"""Session Memory: server-side conversation state shared by a session's turns.
+
+Requests that carry a `session_id` get the session's history instead of
+relying on the client to resend `chat_history`. Every completed turn records
+the query, the answer, the plan and the graded context documents. On the
+next turn the planner and responder see the history, and `search_node`
+reuses earlier documents that are still relevant to a sub-task (cosine
+similarity of cached embeddings) before querying Chroma or the web.
+
+Jobs run in other processes, which cannot see this store: a job carries its
+session's history and documents instead, and the API records its turn once
+the result is read.
+
+Sessions live in memory, expire after SESSION_TTL and are bounded in number.
+Each keeps at most SESSION_MAX_DOCUMENTS documents (least recently used
+dropped first), and its history is compacted: the last SESSION_KEEP_TURNS
+turns stay verbatim, older ones are condensed to one line each and the
+oldest lines are dropped once the history exceeds CONTEXT_BUDGET_HISTORY
+tokens.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.context import ContextDocument, count_tokens
+from app.core.state import SubTask
+from app.tools.embeddings import aembed_texts
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """History and retrieved documents of one conversation."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: list[dict[str, Any]] = []
+        # Condensed older turns, oldest first
+        self.summary: list[str] = []
+        # content hash → document, least recently used first
+        self.documents: OrderedDict[str, ContextDocument] = OrderedDict()
+        # Jobs whose turn was already recorded; a job's result may be read many times
+        self.recorded_jobs: set[str] = set()
+        self.touched_at = time.monotonic()
+
+    def history(self) -> list[dict[str, str]]:
+        """Compacted history in `chat_history` form."""
+        messages: list[dict[str, str]] = []
+        if self.summary:
+            messages.append({"role": "summary", "content": "\n".join(self.summary)})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["query"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        return messages
+
+    def record_turn(self, query: str, answer: str, plan: list[SubTask], documents: list[ContextDocument]) -> None:
+        self.turns.append({
+            "query": query,
+            "answer": answer,
+            "plan": [t.get("description", "") for t in plan],
+        })
+        for doc in documents:
+            self.documents[doc["hash"]] = {"hash": doc["hash"], "text": doc["text"], "task_ids": []}
+            self.documents.move_to_end(doc["hash"])
+        while len(self.documents) > settings.SESSION_MAX_DOCUMENTS:
+            self.documents.popitem(last=False)
+        self._compact()
+
+    def _compact(self) -> None:
+        while len(self.turns) > settings.SESSION_KEEP_TURNS:
+            turn = self.turns.pop(0)
+            answer = " ".join(turn["answer"].split())
+            self.summary.append(f"Q: {turn['query']} → A: {answer[:300]}")
+
+        model = settings.OPENAI_MODEL
+        while self.summary and sum(
+            count_tokens(m["content"], model) for m in self.history()
+        ) > settings.CONTEXT_BUDGET_HISTORY:
+            self.summary.pop(0)
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "turns": len(self.turns) + len(self.summary),
+            "documents": len(self.documents),
+            "history": self.history(),
+        }
+
+
+class SessionStore:
+    """In-memory LRU of sessions with TTL."""
+
+    def __init__(self, ttl_seconds: float, max_sessions: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._reused = 0
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for key in [k for k, s in self._sessions.items() if s.touched_at < cutoff]:
+            del self._sessions[key]
+
+    def get(self, session_id: str) -> Session | None:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.touched_at = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def get_or_create(self, session_id: str) -> Session:
+        session = self.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def record_turn(self, session_id: str, query: str, answer: str,
+                    plan: list[SubTask], documents: list[ContextDocument], job_id: str | None = None) -> None:
+        session = self.get_or_create(session_id)
+        if job_id is not None:
+            if job_id in session.recorded_jobs:
+                return
+            session.recorded_jobs.add(job_id)
+        session.record_turn(query, answer, plan, documents)
+
+    async def relevant_documents(self, session_id: str, target: str) -> list[str]:
+        """Texts of this session's documents most similar to `target`, above the reuse threshold."""
+        session = self.get(session_id)
+        if session is None or not session.documents:
+            return []
+
+        best = await select_documents(list(session.documents.values()), target)
+        for doc in best:
+            session.documents.move_to_end(doc["hash"])
+        self._reused += len(best)
+        return [doc["text"] for doc in best]
+
+    def stats(self) -> dict[str, Any]:
+        self._expire()
+        return {
+            "sessions": len(self._sessions),
+            "documents": sum(len(s.documents) for s in self._sessions.values()),
+            "reused_documents": self._reused,
+            "ttl_seconds": self.ttl_seconds,
+            "max_sessions": self.max_sessions,
+        }
+
+
+async def select_documents(docs: list[ContextDocument], target: str) -> list[ContextDocument]:
+    """The documents most similar to `target`, above the reuse threshold, best first."""
+    if not docs:
+        return []
+    try:
+        vectors = np.asarray(await aembed_texts([target] + [d["text"] for d in docs]), dtype=np.float32)
+    except Exception as exc:
+        logger.warning("Session document embedding failed: %s", exc)
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    vectors /= norms[:, None]
+    scores = vectors[1:] @ vectors[0]
+
+    return [docs[i] for i in np.argsort(-scores)[:settings.SESSION_REUSE_MAX_DOCS]
+            if scores[i] >= settings.SESSION_REUSE_THRESHOLD]
+
+
+session_store = SessionStore(ttl_seconds=settings.SESSION_TTL, max_sessions=settings.SESSION_MAX_SESSIONS)
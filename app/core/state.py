@@ -2,6 +2,7 @@
 
 Each node reads and mutates this state as it flows through the graph.
 Modeled after the enterprise MAS architecture: plan → search → act → review → respond.
+Sub-tasks run in parallel workers, so every key they write has a merging reducer.
 """
 
 from __future__ import annotations
@@ -11,6 +12,8 @@ from typing import Annotated, Any, Literal
 
 from typing_extensions import TypedDict
 
+from app.core.context import ContextDocument, merge_context
+
 
 class SubTask(TypedDict, total=False):
     id: int
@@ -18,6 +21,25 @@ class SubTask(TypedDict, total=False):
     tool: str
     status: Literal["pending", "done", "failed"]
     result: str
+    depends_on: list[int]
+
+
+def merge_plan(left: list[SubTask], right: list[SubTask]) -> list[SubTask]:
+    """Reducer for `plan`: merges sub-tasks by id, keeping the original order.
+
+    Parallel task workers each return only the sub-task they finished, so
+    their updates can be applied in any order without clobbering each other.
+    """
+    merged = list(left or [])
+    positions = {t.get("id"): i for i, t in enumerate(merged)}
+    for task in right or []:
+        i = positions.get(task.get("id"))
+        if i is None:
+            positions[task.get("id")] = len(merged)
+            merged.append(task)
+        else:
+            merged[i] = {**merged[i], **task}
+    return merged
 
 
 class AgentState(TypedDict, total=False):
@@ -26,14 +48,16 @@ class AgentState(TypedDict, total=False):
     # --- input ---
     query: str
     chat_history: list[dict[str, str]]
+    session_id: str | None  # see app.core.sessions
+    session_documents: list[ContextDocument]  # a job's session documents, see app.core.jobs
+    deadline: float | None  # epoch seconds; see app.core.budget
 
     # --- planning ---
-    plan: list[SubTask]
-    current_task_index: int
+    plan: Annotated[list[SubTask], merge_plan]
 
     # --- retrieval ---
-    context_documents: Annotated[list[str], operator.add]
-    search_queries: list[str]
+    context_documents: Annotated[list[ContextDocument], merge_context]
+    search_queries: Annotated[list[str], operator.add]
 
     # --- execution ---
     tool_results: Annotated[list[dict[str, Any]], operator.add]
@@ -50,3 +74,34 @@ class AgentState(TypedDict, total=False):
     # --- routing ---
     next_node: str
     error: str
+
+
+class TaskState(TypedDict, total=False):
+    """State of a single sub-task worker (search → execute).
+
+    One worker is dispatched per ready sub-task; its output keys all have
+    reducers in AgentState so concurrent workers merge cleanly.
+    """
+
+    # --- input (from the dispatcher) ---
+    query: str
+    task: SubTask
+    prior_results: list[dict[str, Any]]
+    session_id: str | None
+    session_documents: list[ContextDocument]
+    deadline: float | None
+
+    # --- output (merged into AgentState) ---
+    plan: Annotated[list[SubTask], merge_plan]
+    context_documents: Annotated[list[ContextDocument], merge_context]
+    search_queries: Annotated[list[str], operator.add]
+    tool_results: Annotated[list[dict[str, Any]], operator.add]
+
+
+class TaskOutput(TypedDict, total=False):
+    """Keys a sub-task worker hands back to the parent graph."""
+
+    plan: Annotated[list[SubTask], merge_plan]
+    context_documents: Annotated[list[ContextDocument], merge_context]
+    search_queries: Annotated[list[str], operator.add]
+    tool_results: Annotated[list[dict[str, Any]], operator.add]
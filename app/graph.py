@@ -1,28 +1,65 @@
 """Enterprise Multi-Agent System Graph.
 
 Defines the LangGraph StateGraph (DAG) that orchestrates:
-  Plan → Search → Execute → (loop if more tasks) → Respond → Review → Finalize/Revise
+  Plan → Dispatch → [Search → Execute] × ready sub-tasks → Dispatch … → Respond → [Review] → Finalize/Revise
 
 This is the central artifact of the system — a directed acyclic graph
 with conditional edges implementing the full Plan-Retrieve-Execute pattern.
+Sub-tasks whose dependencies are satisfied are fanned out with `Send` and
+run concurrently, so wall-clock time follows the plan's critical path.
+Runs are checkpointed per step (see app.core.checkpoints) so a failed run
+can resume where it stopped.
 """
 
 from __future__ import annotations
 
 from langgraph.graph import END, START, StateGraph
 
-from app.core.state import AgentState
+from app.core.checkpoints import run_checkpointer
+from app.core.config import settings
+from app.core.metrics import instrument
+from app.core.sessions import session_store
+from app.core.state import AgentState, TaskOutput, TaskState
 from app.agents.planner import planning_node
 from app.agents.searcher import search_node
 from app.agents.executor import executor_node
 from app.agents.reviewer import review_node
 from app.agents.responder import respond_node
-from app.agents.router import route_after_executor, route_after_review
+from app.agents.router import route_after_respond, route_after_review, route_tasks
+
+
+def _dispatch_node(state: AgentState) -> dict:
+    """Join point: runs once per round, after every dispatched worker finished."""
+    return {}
 
 
 def _finalize_node(state: AgentState) -> dict:
-    """Terminal node: copies draft into final_response."""
-    return {"final_response": state.get("draft_response", "")}
+    """Terminal node: copies draft into final_response and records the session turn."""
+    final = state.get("draft_response", "")
+    if state.get("session_id"):
+        session_store.record_turn(
+            state["session_id"],
+            state["query"],
+            final,
+            state.get("plan", []),
+            state.get("context_documents", []),
+        )
+    return {"final_response": final}
+
+
+def build_task_graph() -> StateGraph:
+    """Construct and compile the per-sub-task worker: search → execute."""
+
+    graph = StateGraph(TaskState, output_schema=TaskOutput)
+
+    graph.add_node("agent_search", instrument("agent_search", search_node))
+    graph.add_node("agent_execute", instrument("agent_execute", executor_node))
+
+    graph.add_edge(START, "agent_search")
+    graph.add_edge("agent_search", "agent_execute")
+    graph.add_edge("agent_execute", END)
+
+    return graph.compile()
 
 
 def build_graph() -> StateGraph:
@@ -31,26 +68,34 @@ def build_graph() -> StateGraph:
     graph = StateGraph(AgentState)
 
     # --- nodes (prefixed to avoid collision with state keys) ---
-    graph.add_node("agent_plan", planning_node)
-    graph.add_node("agent_search", search_node)
-    graph.add_node("agent_execute", executor_node)
-    graph.add_node("agent_respond", respond_node)
-    graph.add_node("agent_review", review_node)
+    # Agent nodes are wrapped to record per-node latency (see app.core.metrics)
+    graph.add_node("agent_plan", instrument("agent_plan", planning_node))
+    graph.add_node("agent_dispatch", _dispatch_node)
+    graph.add_node("agent_task", build_task_graph())
+    graph.add_node("agent_respond", instrument("agent_respond", respond_node))
+    graph.add_node("agent_review", instrument("agent_review", review_node))
     graph.add_node("agent_finalize", _finalize_node)
 
     # --- edges ---
     graph.add_edge(START, "agent_plan")
-    graph.add_edge("agent_plan", "agent_search")
-    graph.add_edge("agent_search", "agent_execute")
+    graph.add_edge("agent_plan", "agent_dispatch")
 
-    # After execution: loop back to search (more tasks) or generate response
+    # Fan out every ready sub-task in parallel, or generate the response
     graph.add_conditional_edges(
-        "agent_execute",
-        route_after_executor,
-        {"search": "agent_search", "respond": "agent_respond"},
+        "agent_dispatch",
+        route_tasks,
+        {"agent_task": "agent_task", "respond": "agent_respond"},
     )
 
-    graph.add_edge("agent_respond", "agent_review")
+    # Workers rejoin at the dispatcher, which releases the next round
+    graph.add_edge("agent_task", "agent_dispatch")
+
+    # Review is skipped when the request's latency budget cannot afford it
+    graph.add_conditional_edges(
+        "agent_respond",
+        route_after_respond,
+        {"review": "agent_review", "finalize": "agent_finalize"},
+    )
 
     # After review: finalize or revise
     graph.add_conditional_edges(
@@ -61,7 +106,8 @@ def build_graph() -> StateGraph:
 
     graph.add_edge("agent_finalize", END)
 
-    return graph.compile()
+    # Sub-task workers inherit the checkpointer, so finished workers survive a failed round
+    return graph.compile(checkpointer=run_checkpointer if settings.CHECKPOINT_ENABLED else None)
 
 
 # Singleton compiled graph
@@ -0,0 +1,196 @@
+"""Embeddings: one cached embedding function shared by ingestion and queries.
+
+Vectors are cached on local disk (SQLite, float32 blobs) keyed by a hash of
+(model, text), so repeated queries and re-ingests skip the remote call. The
+backend is pluggable: "openai" (default) or "local", which runs Chroma's
+bundled ONNX MiniLM model on the CPU and works offline once downloaded.
+Any other Chroma-compatible function can be installed with
+`set_embedding_backend`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from app.core.config import settings
+from app.core.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """SQLite store of text-hash → float32 vector."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+            )
+        return self._conn
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            conn = self._connect()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        record_cache("embeddings", hit=True, count=len(found))
+        record_cache("embeddings", hit=False, count=len(keys) - len(found))
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.astype(np.float32).tobytes()) for key, vector in items.items()],
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                # Oldest rows first; evict down to 90% to amortize the cost
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                    (count - int(self.max_entries * 0.9),),
+                )
+            conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            (count,) = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+        }
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Chroma embedding function that consults the disk cache before the backend."""
+
+    def __init__(self, backend: EmbeddingFunction, model_name: str, cache: EmbeddingCache | None):
+        self.backend = backend
+        self.model_name = model_name
+        self.cache = cache
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if self.cache is None:
+            return [np.asarray(v, dtype=np.float32) for v in self.backend(input)]
+
+        keys = [self._key(text) for text in input]
+        try:
+            cached = self.cache.get_many(list(set(keys)))
+        except sqlite3.Error as exc:
+            logger.warning("Embedding cache lookup failed: %s", exc)
+            cached = {}
+
+        missing = list(dict.fromkeys(text for text, key in zip(input, keys) if key not in cached))
+        if missing:
+            fresh = {
+                self._key(text): np.asarray(vector, dtype=np.float32)
+                for text, vector in zip(missing, self.backend(missing))
+            }
+            try:
+                self.cache.put_many(fresh)
+            except sqlite3.Error as exc:
+                logger.warning("Embedding cache write failed: %s", exc)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+
+_embedding_fn: CachedEmbeddingFunction | None = None
+_cache: EmbeddingCache | None = None
+
+
+def _get_cache() -> EmbeddingCache | None:
+    global _cache
+
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+    return _cache
+
+
+def _build_backend() -> tuple[EmbeddingFunction, str]:
+    if settings.EMBEDDING_BACKEND == "local":
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+        return DefaultEmbeddingFunction(), "local/all-MiniLM-L6-v2"
+
+    from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+
+    fn = OpenAIEmbeddingFunction(api_key=settings.OPENAI_API_KEY, model_name=settings.EMBEDDING_MODEL)
+    return fn, f"openai/{settings.EMBEDDING_MODEL}"
+
+
+def get_embedding_function() -> CachedEmbeddingFunction:
+    """Return the shared, cache-backed embedding function."""
+    global _embedding_fn
+
+    if _embedding_fn is None:
+        backend, model_name = _build_backend()
+        _embedding_fn = CachedEmbeddingFunction(backend, model_name, _get_cache())
+
+    return _embedding_fn
+
+
+def set_embedding_backend(backend: EmbeddingFunction, model_name: str) -> None:
+    """Install a custom embedding function (e.g. a local model or a test double).
+
+    `model_name` namespaces its vectors in the cache. Set it before the
+    knowledge base is first used: vectors of different models do not mix.
+    """
+    global _embedding_fn
+    _embedding_fn = CachedEmbeddingFunction(backend, model_name, _get_cache())
+
+
+def embedding_stats() -> dict[str, Any]:
+    cache = _get_cache()
+    fn = get_embedding_function()
+    return {"model": fn.model_name, **(cache.stats() if cache else {"enabled": False})}
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed texts with the knowledge base's model (cached)."""
+    return [vector.tolist() for vector in get_embedding_function()(texts)]
+
+
+async def aembed_texts(texts: list[str]) -> list[list[float]]:
+    """Async variant of embed_texts (runs in a worker thread)."""
+    return await asyncio.to_thread(embed_texts, texts)
@@ -0,0 +1,220 @@
+"""Ingestion Pipeline: streams documents into the knowledge base.
+
+Long documents are split into overlapping chunks, each chunk gets an id
+derived from its content hash (so re-ingesting is idempotent and concurrent
+ingests cannot collide), and chunks are embedded and stored in size-bounded
+batches with a bounded number of batches in flight. Documents are consumed
+lazily, so memory stays flat no matter how many are loaded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import hashlib
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.tools.knowledge_base import aupsert_chunks
+
+Document = tuple[str, dict[str, Any]]
+
+
+def content_id(text: str) -> str:
+    """Deterministic chunk id: identical text always maps to the same id."""
+    return "doc_" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_text(text: str, chunk_size: int | None = None, overlap: int | None = None) -> list[str]:
+    """Split text into chunks of at most `chunk_size` characters.
+
+    Breaks on paragraph, then sentence, then whitespace boundaries; each chunk
+    after the first starts with the last `overlap` characters of the previous.
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    overlap = settings.INGEST_CHUNK_OVERLAP if overlap is None else overlap
+
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+
+    # Sentences (hard-split on whitespace when too long), "\n\n" marks paragraph ends
+    pieces: list[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            while len(sentence) > chunk_size:
+                cut = sentence.rfind(" ", 0, chunk_size)
+                cut = cut if cut > 0 else chunk_size
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                pieces.append(sentence)
+        pieces.append("\n\n")
+
+    chunks: list[str] = []
+    current = ""
+    for piece in pieces:
+        joiner = "" if piece == "\n\n" or not current or current.endswith("\n\n") else " "
+        if len(current) + len(joiner) + len(piece) > chunk_size and current.strip():
+            chunks.append(current.strip())
+            # Carry the overlap over, starting on a word boundary, if it still fits
+            tail = current[-overlap:] if overlap else ""
+            current = tail[tail.find(" ") + 1:] if " " in tail else ""
+            if len(current) + 1 + len(piece) > chunk_size:
+                current = ""
+            joiner = " " if current else ""
+        current += joiner + piece
+    if current.strip():
+        chunks.append(current.strip())
+
+    return chunks
+
+
+async def _aiter(documents: Iterable[Document] | AsyncIterable[Document]) -> AsyncIterator[Document]:
+    if hasattr(documents, "__aiter__"):
+        async for doc in documents:
+            yield doc
+    else:
+        for doc in documents:
+            yield doc
+
+
+async def ingest_stream(
+    documents: Iterable[Document] | AsyncIterable[Document],
+) -> AsyncIterator[dict[str, int]]:
+    """Ingest (text, metadata) pairs, yielding progress after every stored batch.
+
+    Progress dicts carry running totals: documents read, chunks produced,
+    chunks newly stored, and duplicates skipped.
+    """
+    semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+    pending: set[asyncio.Task] = set()
+    progress = {"documents": 0, "chunks": 0, "stored": 0, "duplicates": 0, "batches": 0}
+
+    ids: list[str] = []
+    texts: list[str] = []
+    metadatas: list[dict[str, Any]] = []
+    seen: set[str] = set()
+
+    async def _store(batch_ids: list[str], batch_texts: list[str], batch_meta: list[dict]) -> int:
+        try:
+            return await aupsert_chunks(batch_ids, batch_texts, batch_meta)
+        finally:
+            semaphore.release()
+
+    def _record(task: asyncio.Task) -> None:
+        batch_size, stored = task.batch_size, task.result()  # type: ignore[attr-defined]
+        progress["stored"] += stored
+        progress["duplicates"] += batch_size - stored
+        progress["batches"] += 1
+
+    async def _flush() -> None:
+        nonlocal ids, texts, metadatas
+        # Waits while INGEST_CONCURRENCY batches are already being embedded
+        await semaphore.acquire()
+        task = asyncio.create_task(_store(ids, texts, metadatas))
+        task.batch_size = len(ids)  # type: ignore[attr-defined]
+        pending.add(task)
+        ids, texts, metadatas = [], [], []
+
+    def _completed() -> list[dict[str, int]]:
+        snapshots = []
+        for task in [t for t in pending if t.done()]:
+            pending.discard(task)
+            _record(task)
+            snapshots.append(dict(progress))
+        return snapshots
+
+    try:
+        async for text, metadata in _aiter(documents):
+            progress["documents"] += 1
+            source_id = content_id(text)
+
+            for i, chunk in enumerate(chunk_text(text)):
+                progress["chunks"] += 1
+                chunk_id = content_id(chunk)
+                if chunk_id in seen:
+                    progress["duplicates"] += 1
+                    continue
+                seen.add(chunk_id)
+
+                ids.append(chunk_id)
+                texts.append(chunk)
+                metadatas.append({**(metadata or {}), "source_id": source_id, "chunk": i})
+
+                if len(ids) >= settings.INGEST_BATCH_SIZE:
+                    await _flush()
+                    for snapshot in _completed():
+                        yield snapshot
+
+            # Bound the in-memory dedupe set on very large loads
+            if len(seen) > 100_000:
+                seen.clear()
+
+        if ids:
+            await _flush()
+        if pending:
+            await asyncio.wait(pending)
+        for snapshot in _completed():
+            yield snapshot
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def ingest_documents(texts: list[str], metadatas: list[dict] | None = None) -> dict[str, int]:
+    """Ingest a list of documents and return the final progress totals."""
+    documents = zip(texts, metadatas or [{}] * len(texts))
+    totals = {"documents": 0, "chunks": 0, "stored": 0, "duplicates": 0, "batches": 0}
+    async for progress in ingest_stream(documents):
+        totals = progress
+    return totals
+
+
+async def upload_lines(file: UploadFile) -> AsyncIterator[str]:
+    """Yield the lines of an uploaded file as they arrive, without loading it whole."""
+    # Incremental, so a character split across two reads is decoded whole
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    while chunk := await file.read(64 * 1024):
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def read_upload(file: UploadFile) -> AsyncIterator[Document]:
+    """Yield documents from an uploaded file without loading it whole.
+
+    `.jsonl` files hold one document per line, either a string or an object
+    with "text" and optional "metadata"; any other file is plain text where
+    documents are separated by blank lines.
+    """
+    is_jsonl = (file.filename or "").lower().endswith((".jsonl", ".ndjson"))
+    source = {"source": file.filename or "upload"}
+    paragraph: list[str] = []
+
+    async for line in upload_lines(file):
+        if is_jsonl:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield record, source
+            else:
+                yield record["text"], {**source, **record.get("metadata", {})}
+        elif line.strip():
+            paragraph.append(line)
+        elif paragraph:
+            yield "\n".join(paragraph), source
+            paragraph = []
+
+    if paragraph:
+        yield "\n".join(paragraph), source
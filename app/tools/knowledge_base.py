@@ -1,25 +1,67 @@
 """Knowledge Base Tool: local vector store for enterprise document retrieval.
 
-Uses ChromaDB with OpenAI embeddings for semantic search.
-Supports ingestion and querying of documents.
+Uses ChromaDB with the shared, disk-cached embedding function
+(app/tools/embeddings.py) for semantic search, plus a BM25 lexical index
+kept in step with the collection; query results fuse both rankings with
+reciprocal rank fusion. Chunking, ids and batching live in the ingestion
+pipeline (app/tools/ingestion.py). Chroma's client is blocking, so the
+async variants run it in a worker thread to keep the event loop free.
+
+The embedded store in CHROMA_PERSIST_DIR belongs to a single process; with
+several (API plus job workers) set CHROMA_HOST to use a Chroma server. The
+lexical index is a SQLite file in KB_LEXICAL_DIR, which those processes
+must share. It is reconciled with the collection by chunk id when first
+opened and after any failed write, so chunks Chroma holds but the index
+missed are indexed again.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+import re
+import threading
 from pathlib import Path
+from typing import Any
 
 import chromadb
-from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 
 from app.core.config import settings
+from app.tools.embeddings import get_embedding_function
+from app.tools.lexical_index import LexicalIndex
 
 logger = logging.getLogger(__name__)
 
 _client: chromadb.ClientAPI | None = None
 _collection: chromadb.Collection | None = None
+_lexical_index: LexicalIndex | None = None
+# Set when a lexical write failed after Chroma stored the chunks
+_lexical_stale = False
+# Ingestion batches run in worker threads; only one may open the store
+_init_lock = threading.RLock()
 
 COLLECTION_NAME = "enterprise_kb"
+# Collections built before the embedding backend became configurable hold these vectors
+_LEGACY_EMBEDDING_MODEL = "openai/text-embedding-3-small"
+
+
+def _collection_name() -> str:
+    """Vectors of different models cannot share a collection.
+
+    The name carries the embedding model (e.g. `enterprise_kb_openai_text-embedding-3-large`),
+    reduced to what Chroma accepts: at most 63 characters of [a-zA-Z0-9_-],
+    ending in an alphanumeric one.
+    """
+    model_name = get_embedding_function().model_name
+    if model_name == _LEGACY_EMBEDDING_MODEL:
+        return COLLECTION_NAME
+    slug = re.sub(r"[^a-zA-Z0-9_-]+", "_", model_name).strip("_-")
+    name = f"{COLLECTION_NAME}_{slug}"
+    if len(name) > 63:
+        digest = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:8]
+        name = f"{name[:54].rstrip('_-')}_{digest}"
+    return name
 
 
 def _get_collection() -> chromadb.Collection:
@@ -28,48 +70,145 @@ def _get_collection() -> chromadb.Collection:
     if _collection is not None:
         return _collection
 
-    persist_dir = Path(settings.CHROMA_PERSIST_DIR)
-    persist_dir.mkdir(parents=True, exist_ok=True)
-
-    _client = chromadb.PersistentClient(path=str(persist_dir))
+    with _init_lock:
+        if _collection is None:
+            if settings.CHROMA_HOST:
+                _client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+            else:
+                persist_dir = Path(settings.CHROMA_PERSIST_DIR)
+                persist_dir.mkdir(parents=True, exist_ok=True)
+                _client = chromadb.PersistentClient(path=str(persist_dir))
 
-    embedding_fn = OpenAIEmbeddingFunction(
-        api_key=settings.OPENAI_API_KEY,
-        model_name="text-embedding-3-small",
-    )
-
-    _collection = _client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=embedding_fn,
-    )
+            _collection = _client.get_or_create_collection(
+                name=_collection_name(),
+                embedding_function=get_embedding_function(),
+            )
 
     return _collection
 
 
-def ingest_documents(texts: list[str], metadatas: list[dict] | None = None) -> int:
-    """Add documents to the knowledge base. Returns count of added docs."""
+def _reconcile_lexical(index: LexicalIndex) -> None:
+    """Index every chunk of the collection the lexical index is missing, by id."""
     collection = _get_collection()
-    ids = [f"doc_{collection.count() + i}" for i in range(len(texts))]
+    added = offset = 0
+    while (page := collection.get(include=[], limit=1000, offset=offset))["ids"]:
+        missing = index.missing(page["ids"])
+        if missing:
+            docs = collection.get(ids=missing, include=["documents"])
+            added += index.add(docs["ids"], docs["documents"])
+        offset += len(page["ids"])
+    if added:
+        logger.info("Lexical index backfilled with %d chunks", added)
+
+
+def _get_lexical_index() -> LexicalIndex:
+    global _lexical_index, _lexical_stale
+
+    if _lexical_index is not None and not _lexical_stale:
+        return _lexical_index
+
+    with _init_lock:
+        if _lexical_index is None:
+            index = LexicalIndex(str(Path(settings.KB_LEXICAL_DIR) / f"{_collection_name()}_lexical.sqlite3"))
+            _reconcile_lexical(index)
+            _lexical_index = index
+        elif _lexical_stale:
+            _lexical_stale = False
+            try:
+                _reconcile_lexical(_lexical_index)
+            except Exception:
+                _lexical_stale = True
+                raise
+        return _lexical_index
+
+
+def upsert_chunks(ids: list[str], texts: list[str], metadatas: list[dict]) -> int:
+    """Store chunks under content-derived ids, skipping ones already present.
+
+    Existing ids are filtered out first so re-ingesting a document costs one
+    lookup instead of a new embedding call. Returns the number of new chunks.
+    """
+    global _lexical_stale
 
-    collection.add(
-        documents=texts,
-        ids=ids,
-        metadatas=metadatas or [{}] * len(texts),
-    )
-    return len(ids)
+    collection = _get_collection()
+    existing = set(collection.get(ids=ids, include=[])["ids"])
 
+    new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+    if new:
+        collection.upsert(
+            ids=[ids[i] for i in new],
+            documents=[texts[i] for i in new],
+            metadatas=[metadatas[i] for i in new],
+        )
+
+    # Index the new chunks, and any stored ones an earlier failed write left out
+    try:
+        index = _get_lexical_index()
+        pending = index.missing(ids)
+        text_of = dict(zip(ids, texts))
+        index.add(pending, [text_of[chunk_id] for chunk_id in pending])
+    except Exception as exc:
+        # The vectors are stored; the index catches up by id on its next use
+        logger.warning("Lexical index write failed, will reconcile: %s", exc)
+        _lexical_stale = True
+    return len(new)
+
+
+def search_knowledge_base(query: str, n_results: int | None = None) -> list[dict[str, Any]]:
+    """Hybrid search: vector and BM25 hits merged by reciprocal rank fusion.
+
+    Each hit is {"id", "text", "distance", "score"}; `distance` is the Chroma
+    distance, or None when the chunk was found only lexically.
+    """
+    n_results = n_results or settings.KB_TOP_K
 
-def query_knowledge_base(query: str, n_results: int = 3) -> list[str]:
-    """Query the knowledge base and return relevant document texts."""
     try:
         collection = _get_collection()
-        if collection.count() == 0:
+        total = collection.count()
+        if total == 0:
             return []
 
-        results = collection.query(query_texts=[query], n_results=min(n_results, collection.count()))
-        documents = results.get("documents", [[]])[0]
-        return documents
+        results = collection.query(
+            query_texts=[query],
+            n_results=min(max(n_results, settings.KB_VECTOR_K), total),
+            include=["documents", "distances"],
+        )
+        vector_hits = list(zip(results["ids"][0], results["documents"][0], results["distances"][0]))
+
+        lexical_hits = []
+        if settings.KB_HYBRID_ENABLED:
+            lexical_hits = _get_lexical_index().search(query, settings.KB_LEXICAL_K)
 
     except Exception as exc:
         logger.warning("Knowledge base query failed: %s", exc)
         return []
+
+    fused: dict[str, dict[str, Any]] = {}
+    for rank, (chunk_id, text, distance) in enumerate(vector_hits, start=1):
+        fused[chunk_id] = {"id": chunk_id, "text": text, "distance": distance,
+                           "score": 1.0 / (settings.KB_RRF_K + rank)}
+    for rank, (chunk_id, text, _) in enumerate(lexical_hits, start=1):
+        hit = fused.setdefault(chunk_id, {"id": chunk_id, "text": text, "distance": None, "score": 0.0})
+        hit["score"] += 1.0 / (settings.KB_RRF_K + rank)
+
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:n_results]
+
+
+def query_knowledge_base(query: str, n_results: int | None = None) -> list[str]:
+    """Query the knowledge base and return relevant document texts."""
+    return [hit["text"] for hit in search_knowledge_base(query, n_results)]
+
+
+async def aupsert_chunks(ids: list[str], texts: list[str], metadatas: list[dict]) -> int:
+    """Async variant of upsert_chunks (runs in a worker thread)."""
+    return await asyncio.to_thread(upsert_chunks, ids, texts, metadatas)
+
+
+async def asearch_knowledge_base(query: str, n_results: int | None = None) -> list[dict[str, Any]]:
+    """Async variant of search_knowledge_base (runs in a worker thread)."""
+    return await asyncio.to_thread(search_knowledge_base, query, n_results)
+
+
+async def aquery_knowledge_base(query: str, n_results: int | None = None) -> list[str]:
+    """Async variant of query_knowledge_base (runs in a worker thread)."""
+    return await asyncio.to_thread(query_knowledge_base, query, n_results)
@@ -0,0 +1,100 @@
+"""Lexical Index: BM25 keyword search maintained alongside the Chroma collection.
+
+Dense vectors are weak on exact tokens such as SKUs, error codes and policy
+ids. Every chunk stored in Chroma is also added to a SQLite FTS5 index (which
+ranks with BM25); the knowledge base fuses both result lists. Hyphens and
+underscores are kept inside tokens so "ERR-4021" or "POL_17" match whole.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[\w\-]+", re.UNICODE)
+
+
+class LexicalIndex:
+    """SQLite FTS5 (BM25) index over knowledge base chunks."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, text TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                " text, content='chunks', content_rowid='rowid',"
+                " tokenize=\"unicode61 tokenchars '-_'\")"
+            )
+        return self._conn
+
+    def add(self, ids: list[str], texts: list[str]) -> int:
+        """Index chunks; ids already present are ignored. Returns count added."""
+        added = 0
+        with self._lock:
+            conn = self._connect()
+            for chunk_id, text in zip(ids, texts):
+                cursor = conn.execute("INSERT OR IGNORE INTO chunks (id, text) VALUES (?, ?)", (chunk_id, text))
+                if cursor.rowcount:
+                    conn.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text))
+                    added += 1
+            conn.commit()
+        return added
+
+    def missing(self, ids: list[str]) -> list[str]:
+        """The given ids that are not indexed."""
+        if not ids:
+            return []
+        with self._lock:
+            conn = self._connect()
+            present = {
+                row[0]
+                for start in range(0, len(ids), 500)
+                for row in conn.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(ids[start:start + 500]))})",
+                    ids[start:start + 500],
+                )
+            }
+        return [chunk_id for chunk_id in ids if chunk_id not in present]
+
+    def count(self) -> int:
+        with self._lock:
+            (n,) = self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()
+        return n
+
+    def search(self, query: str, k: int) -> list[tuple[str, str, float]]:
+        """Return up to k (id, text, bm25) tuples, best first (lower bm25 is better)."""
+        tokens = list(dict.fromkeys(t.lower() for t in _TOKEN_RE.findall(query)))
+        if not tokens:
+            return []
+
+        # Quote every token so FTS5 operators in user text are taken literally
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in tokens)
+
+        with self._lock:
+            try:
+                rows = self._connect().execute(
+                    "SELECT c.id, c.text, bm25(chunks_fts) AS score"
+                    " FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid"
+                    " WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+                    (match, k),
+                ).fetchall()
+            except sqlite3.OperationalError as exc:
+                logger.warning("Lexical search failed: %s", exc)
+                return []
+        return rows
@@ -1,33 +1,203 @@
 """Web Search Tool: retrieves information from the internet.
 
-Uses DuckDuckGo as the search backend — no API key required.
+Uses DuckDuckGo as the default search backend — no API key required.
 Returns a list of text snippets suitable for LLM consumption.
+
+Searches go through a shared WebSearchService that caches results per
+normalized query for a TTL and collapses identical in-flight queries into a
+single backend call. Backends are pluggable: `FixtureBackend` serves canned
+results for tests and benchmarks without touching the network.
 """
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+
+from app.core.config import settings
+from app.core.metrics import record_cache
 
 logger = logging.getLogger(__name__)
 
 
-def web_search(query: str, max_results: int = 3) -> list[str]:
-    """Search the web and return text snippets."""
-    try:
-        from duckduckgo_search import DDGS
+class SearchBackend(Protocol):
+    """Anything that can turn a query into raw results ({title, href, body})."""
+
+    async def search(self, query: str, max_results: int) -> list[dict[str, str]]: ...
+
+
+class DuckDuckGoBackend:
+    """DuckDuckGo text search. DDGS is blocking, so calls run in worker threads,
+    each of which keeps and reuses its own DDGS session."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _session(self):
+        if getattr(self._local, "ddgs", None) is None:
+            from duckduckgo_search import DDGS
+
+            self._local.ddgs = DDGS()
+        return self._local.ddgs
+
+    def _search_sync(self, query: str, max_results: int) -> list[dict[str, str]]:
+        return list(self._session().text(query, max_results=max_results))
+
+    async def search(self, query: str, max_results: int) -> list[dict[str, str]]:
+        return await asyncio.to_thread(self._search_sync, query, max_results)
+
+
+class FixtureBackend:
+    """Offline backend: canned results per normalized query, else synthetic ones.
+
+    `fixtures` maps queries to result lists; `path` may point to a JSON file
+    with the same shape. `latency_ms` simulates network time.
+    """
+
+    def __init__(self, fixtures: dict[str, list[dict[str, str]]] | None = None,
+                 path: str | None = None, latency_ms: float = 0.0):
+        data = dict(fixtures or {})
+        if path:
+            with open(path, encoding="utf-8") as fh:
+                data.update(json.load(fh))
+        self._fixtures = {normalize_query(q): results for q, results in data.items()}
+        self.latency_ms = latency_ms
+
+    async def search(self, query: str, max_results: int) -> list[dict[str, str]]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        results = self._fixtures.get(normalize_query(query))
+        if results is None:
+            slug = "-".join(normalize_query(query).split())[:60]
+            results = [
+                {
+                    "title": f"Result {i} for {query}",
+                    "href": f"https://example.com/{slug}/{i}",
+                    "body": f"Synthetic search result {i} about {query}.",
+                }
+                for i in range(1, max_results + 1)
+            ]
+        return results[:max_results]
+
 
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
 
-        snippets: list[str] = []
-        for r in results:
-            title = r.get("title", "")
-            body = r.get("body", "")
-            href = r.get("href", "")
-            snippets.append(f"[{title}]({href})\n{body}")
 
+def _format_results(results: list[dict[str, Any]]) -> list[str]:
+    snippets: list[str] = []
+    for r in results:
+        title = r.get("title", "")
+        body = r.get("body", "")
+        href = r.get("href", "")
+        snippets.append(f"[{title}]({href})\n{body}")
+    return snippets
+
+
+class WebSearchService:
+    """TTL-cached, single-flight front for a SearchBackend."""
+
+    def __init__(self, backend: SearchBackend, ttl_seconds: float, max_entries: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._cache: OrderedDict[tuple[str, int], tuple[list[str], float]] = OrderedDict()
+        self._inflight: dict[tuple[str, int], asyncio.Task] = {}
+        self._waiters: dict[tuple[str, int], int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def set_backend(self, backend: SearchBackend) -> None:
+        """Swap the backend (e.g. a fixture in tests) and drop cached results."""
+        self.backend = backend
+        self._cache.clear()
+
+    def _forget(self, key: tuple[str, int], task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _fetch(self, key: tuple[str, int], query: str, max_results: int) -> list[str]:
+        try:
+            snippets = _format_results(await self.backend.search(query, max_results))
+        except Exception as exc:
+            logger.warning("Web search failed: %s", exc)
+            return [f"Web search unavailable: {exc}"]
+
+        self._cache[key] = (snippets, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
         return snippets
 
-    except Exception as exc:
-        logger.warning("Web search failed: %s", exc)
-        return [f"Web search unavailable: {exc}"]
+    async def search(self, query: str, max_results: int = 3) -> list[str]:
+        key = (normalize_query(query), max_results)
+
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl_seconds:
+            self._cache.move_to_end(key)
+            self._hits += 1
+            record_cache("web_search", hit=True)
+            return cached[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._misses += 1
+            record_cache("web_search", hit=False)
+            task = asyncio.ensure_future(self._fetch(key, query, max_results))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._coalesced += 1
+            record_cache("web_search", hit=True)
+
+        # Shield so one cancelled caller does not cancel the shared search;
+        # the search itself is cancelled once every caller has gone away
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done():
+                    self._forget(key, task)
+                    task.cancel()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses + self._coalesced
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self._cache),
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "hit_rate": round((self._hits + self._coalesced) / lookups, 4) if lookups else 0.0,
+            "in_flight": len(self._inflight),
+        }
+
+
+def _default_backend() -> SearchBackend:
+    if settings.WEB_SEARCH_BACKEND == "fixture":
+        return FixtureBackend(path=settings.WEB_SEARCH_FIXTURE_PATH or None)
+    return DuckDuckGoBackend()
+
+
+web_search_service = WebSearchService(
+    backend=_default_backend(),
+    ttl_seconds=settings.WEB_SEARCH_CACHE_TTL,
+    max_entries=settings.WEB_SEARCH_CACHE_MAX_ENTRIES,
+)
+
+
+async def aweb_search(query: str, max_results: int = 3) -> list[str]:
+    """Search the web and return text snippets (cached, deduplicated)."""
+    return await web_search_service.search(query, max_results)
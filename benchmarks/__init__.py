@@ -0,0 +1 @@
+"""Offline benchmarks for the enterprise MAS (fake LLM, search and embeddings)."""
@@ -0,0 +1,155 @@
+"""Benchmark fakes: deterministic stand-ins for the OpenAI chat and embedding APIs.
+
+FakeChatModel recognises each agent by its system prompt and answers with a
+well-formed reply after a simulated latency, so the whole graph (planning,
+grading, execution, streaming response, review) runs without network access.
+HashEmbeddingFunction produces bag-of-words vectors so retrieval still ranks
+related chunks first. Web search uses the app's own FixtureBackend.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.agents.executor import EXECUTOR_SYSTEM
+from app.agents.grader import BATCH_GRADER_SYSTEM, GRADER_SYSTEM, PAIRS_GRADER_SYSTEM
+from app.agents.planner import PLAN_SYSTEM
+from app.agents.responder import RESPOND_SYSTEM
+from app.agents.reviewer import REVIEW_SYSTEM
+from app.agents.searcher import REPHRASE_SYSTEM
+
+
+def _first_line(text: str) -> str:
+    return text.split("\n", 1)[0]
+
+
+_ROLES = {
+    _first_line(PLAN_SYSTEM): "planner",
+    _first_line(BATCH_GRADER_SYSTEM): "batch_grader",
+    _first_line(PAIRS_GRADER_SYSTEM): "batch_grader",
+    _first_line(GRADER_SYSTEM): "grader",
+    _first_line(REPHRASE_SYSTEM): "rephraser",
+    _first_line(EXECUTOR_SYSTEM): "executor",
+    _first_line(RESPOND_SYSTEM): "responder",
+    _first_line(REVIEW_SYSTEM): "reviewer",
+}
+
+
+def _plan(query: str, tasks: int) -> list[dict[str, Any]]:
+    """`tasks - 1` independent searches plus one task that combines them."""
+    searches = [
+        {"id": i, "description": f"Research aspect {i} of: {query}", "tool": "search",
+         "status": "pending", "depends_on": []}
+        for i in range(1, tasks)
+    ]
+    combine = {"id": tasks, "description": f"Combine the findings for: {query}", "tool": "general",
+               "status": "pending", "depends_on": [t["id"] for t in searches]}
+    return searches + [combine]
+
+
+def fake_reply(messages: list[BaseMessage], plan_tasks: int = 3) -> str:
+    system = messages[0].content if messages else ""
+    user = messages[-1].content if messages else ""
+    role = _ROLES.get(_first_line(system), "responder")
+
+    if role == "planner":
+        return json.dumps(_plan(user.strip(), plan_tasks))
+    if role == "batch_grader":
+        count = len(re.findall(r"^\[\d+\] ", user, re.M))
+        return json.dumps([i % 3 != 2 for i in range(count)])
+    if role == "grader":
+        return "yes"
+    if role == "rephraser":
+        return f"{user.strip()[:80]} overview"
+    if role == "executor":
+        return json.dumps({"result": f"Findings for {user.strip()[:60]}", "status": "done"})
+    if role == "reviewer":
+        return json.dumps({"passed": True, "feedback": ""})
+    return (
+        "## Summary\n\nBased on the retrieved context and the sub-task results, "
+        "here is a synthesized answer. " + " ".join(f"point-{i}" for i in range(60))
+    )
+
+
+def _usage(messages: list[BaseMessage], reply: str) -> dict[str, int]:
+    prompt = sum(len(str(m.content)) for m in messages) // 4 + 1
+    completion = len(reply) // 4 + 1
+    return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers each agent deterministically after `latency_ms`.
+
+    Streaming emits the reply in `chunk_chars` pieces, spreading the latency
+    over them like a real token stream.
+    """
+
+    model_name: str = "fake-gpt"
+    temperature: float = 0.0
+    latency_ms: float = 50.0
+    chunk_chars: int = 16
+    plan_tasks: int = 3
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        reply = fake_reply(messages, self.plan_tasks)
+        message = AIMessage(content=reply, usage_metadata=_usage(messages, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+    async def _astream(self, messages: list[BaseMessage], stop=None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        reply = fake_reply(messages, self.plan_tasks)
+        pieces = [reply[i:i + self.chunk_chars] for i in range(0, len(reply), self.chunk_chars)]
+        delay = self.latency_ms / 1000 / max(len(pieces), 1)
+
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(delay)
+            usage = _usage(messages, reply) if i == len(pieces) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Hashed bag-of-words vectors, with a simulated per-call latency."""
+
+    def __init__(self, dimensions: int = 256, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        vectors = []
+        for text in input:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for word in re.findall(r"\w+", text.lower()):
+                vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimensions] += 1.0
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+        return vectors
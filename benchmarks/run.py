@@ -0,0 +1,314 @@
+"""Offline load test: drive the MAS graph or the HTTP API with fake backends.
+
+Runs entirely on a laptop — the OpenAI chat and embedding APIs and web search
+are replaced by deterministic fakes with configurable simulated latency, and
+all on-disk state (Chroma, caches, grader logs) lives in a temporary
+directory. Reports p50/p95/p99 latency, requests/sec and LLM calls, tokens
+and cost per request.
+
+Usage:
+    python -m benchmarks.run --mode graph -n 100 -c 10
+    python -m benchmarks.run --mode stream -n 50 -c 5 --llm-latency-ms 200 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any
+
+_TOPICS = [
+    "expense reimbursement", "remote work", "data retention", "incident response",
+    "vendor onboarding", "access reviews", "travel approvals", "security training",
+    "backup rotation", "customer escalations", "release management", "on-call rotation",
+]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["graph", "http", "stream"], default="graph",
+                        help="graph: mas_graph.ainvoke; http: POST /api/chat; stream: POST /api/chat/stream")
+    parser.add_argument("-n", "--requests", type=int, default=50, help="measured requests")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests run first")
+    parser.add_argument("--unique-queries", type=int, default=0,
+                        help="cycle through this many distinct queries (0: every query is distinct)")
+    parser.add_argument("--queries", help="file with one query per line (overrides generated queries)")
+    parser.add_argument("--plan-tasks", type=int, default=3,
+                        help="sub-tasks in each fake plan (above 1, generated queries are multi-part so they reach it)")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--search-latency-ms", type=float, default=100.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--documents", type=int, default=200, help="synthetic documents seeded into the KB")
+    parser.add_argument("--rpm", type=float, default=0, help="LLM requests/minute limit (0: unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="LLM tokens/minute limit (0: unlimited)")
+    parser.add_argument("--max-latency-ms", type=int, help="per-request latency budget (ChatRequest.max_latency_ms)")
+    parser.add_argument("--cache", action="store_true",
+                        help="keep the semantic response cache, LLM memo and plan cache enabled")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="send every query through the LLM planner (disable the query classifier)")
+    parser.add_argument("--no-prefetch", action="store_true",
+                        help="wait for the whole plan before starting knowledge base retrieval")
+    parser.add_argument("--no-checkpoints", action="store_true", help="run the graph without the SQLite checkpointer")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def _configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Point every piece of on-disk state at `workdir` (must run before importing app)."""
+    enabled = "true" if args.cache else "false"
+    os.environ.update({
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-benchmark",
+        "CHROMA_PERSIST_DIR": os.path.join(workdir, "chroma"),
+        "EMBEDDING_BACKEND": "benchmark",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "MEMO_DB_PATH": os.path.join(workdir, "llm_memo.sqlite3"),
+        "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.sqlite3"),
+        "GRADER_DECISION_LOG": os.path.join(workdir, "grader_decisions.jsonl"),
+        "GRADER_THRESHOLDS_PATH": os.path.join(workdir, "grader_thresholds.json"),
+        "WEB_SEARCH_BACKEND": "fixture",
+        "SEMANTIC_CACHE_ENABLED": enabled,
+        "MEMO_ENABLED": enabled,
+        "PLAN_CACHE_ENABLED": enabled,
+        "PLANNER_FAST_PATH_ENABLED": "false" if args.no_fast_path else "true",
+        "PLAN_PREFETCH_ENABLED": "false" if args.no_prefetch else "true",
+        "CHECKPOINT_ENABLED": "false" if args.no_checkpoints else "true",
+        "LLM_RPM_LIMIT": str(args.rpm),
+        "LLM_TPM_LIMIT": str(args.tpm),
+    })
+
+
+def _install_fakes(args: argparse.Namespace) -> None:
+    from benchmarks.fakes import FakeChatModel, HashEmbeddingFunction
+    from app.core.llm import set_llm_factory
+    from app.tools.embeddings import set_embedding_backend
+    from app.tools.web_search import FixtureBackend, web_search_service
+
+    set_llm_factory(lambda **kwargs: FakeChatModel(
+        model_name=kwargs.pop("model"),
+        latency_ms=args.llm_latency_ms,
+        plan_tasks=args.plan_tasks,
+        **kwargs,
+    ))
+    set_embedding_backend(HashEmbeddingFunction(latency_ms=args.embed_latency_ms), "benchmark/hash-256")
+    web_search_service.set_backend(FixtureBackend(latency_ms=args.search_latency_ms))
+
+
+async def _seed_knowledge_base(count: int) -> None:
+    from app.tools.ingestion import ingest_documents
+
+    documents = [
+        f"Policy {i} on {_TOPICS[i % len(_TOPICS)]}: requests must be approved by the owning team, "
+        f"reviewed every {i % 12 + 1} months and documented in the {_TOPICS[(i * 7) % len(_TOPICS)]} runbook."
+        for i in range(count)
+    ]
+    if documents:
+        await ingest_documents(documents)
+
+
+def _queries(args: argparse.Namespace) -> list[str]:
+    total = args.warmup + args.requests
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as fh:
+            pool = [line.strip() for line in fh if line.strip()]
+    else:
+        distinct = args.unique_queries or total
+        if args.plan_tasks > 1:
+            # Multi-part, so the query classifier hands them to the planner instead of a one-task plan
+            pool = [
+                f"Compare the policies on {_TOPICS[i % len(_TOPICS)]} and "
+                f"{_TOPICS[(i + 5) % len(_TOPICS)]} for team {i}."
+                for i in range(distinct)
+            ]
+        else:
+            pool = [
+                f"What is the policy on {_TOPICS[i % len(_TOPICS)]} for team {i}?"
+                for i in range(distinct)
+            ]
+    return [pool[i % len(pool)] for i in range(total)]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+async def _run_graph(query: str, max_latency_ms: int | None) -> dict[str, Any]:
+    from app.core.budget import deadline_from
+    from app.core.checkpoints import new_run_id, run_config
+    from app.core.config import settings
+    from app.core.metrics import start_run
+    from app.graph import mas_graph
+
+    run = start_run()
+    await mas_graph.ainvoke({
+        "query": query,
+        "chat_history": [],
+        "deadline": deadline_from(max_latency_ms),
+        "revision_count": 0,
+    }, run_config(new_run_id()), durability=settings.CHECKPOINT_DURABILITY)
+    return run.summary()
+
+
+async def _run_http(client, mode: str, query: str, max_latency_ms: int | None) -> dict[str, Any]:
+    body = {"query": query, "include_metrics": True, "max_latency_ms": max_latency_ms}
+    if mode == "http":
+        response = await client.post("/api/chat", json=body)
+        response.raise_for_status()
+        return response.json()["metrics"]
+
+    metrics: dict[str, Any] = {}
+    async with client.stream("POST", "/api/chat/stream", json=body) as response:
+        response.raise_for_status()
+        event = ""
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "done":
+                metrics = json.loads(line[6:])["metrics"]
+            elif line.startswith("data: ") and event == "error":
+                raise RuntimeError(json.loads(line[6:])["detail"])
+    return metrics
+
+
+async def _drive(args: argparse.Namespace) -> dict[str, Any]:
+    import httpx
+    from fastapi import FastAPI
+
+    from app.api.routes import router
+
+    client = None
+    if args.mode != "graph":
+        app = FastAPI()
+        app.include_router(router)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None)
+
+    async def one(query: str, max_latency_ms: int | None) -> dict[str, Any]:
+        if client is None:
+            return await _run_graph(query, max_latency_ms)
+        return await _run_http(client, args.mode, query, max_latency_ms)
+
+    # Warm-up runs are unbudgeted so step duration estimates get measured
+    queries = _queries(args)
+    for query in queries[:args.warmup]:
+        await one(query, None)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    runs: list[dict[str, Any]] = []
+    errors: Counter[str] = Counter()
+
+    async def measured(query: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                runs.append(await one(query, args.max_latency_ms))
+            except Exception as exc:
+                errors[type(exc).__name__] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(measured(q) for q in queries[args.warmup:]))
+    wall = time.perf_counter() - wall_start
+
+    if client is not None:
+        await client.aclose()
+
+    return _report(args, latencies, runs, errors, wall)
+
+
+def _report(args: argparse.Namespace, latencies: list[float], runs: list[dict[str, Any]],
+            errors: Counter[str], wall: float) -> dict[str, Any]:
+    completed = len(latencies)
+
+    def per_request(key: str, digits: int = 1) -> float:
+        return round(sum(r["llm"][key] for r in runs) / completed, digits) if completed else 0.0
+
+    def ms(seconds: float) -> float:
+        return round(seconds * 1000, 1)
+
+    cache: Counter[str] = Counter()
+    for r in runs:
+        for name, counts in r.get("cache", {}).items():
+            cache[f"{name}_hit"] += counts["hit"]
+            cache[f"{name}_miss"] += counts["miss"]
+
+    return {
+        "mode": args.mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "completed": completed,
+        "errors": dict(errors),
+        "wall_s": round(wall, 3),
+        "rps": round(completed / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": ms(_percentile(latencies, 50)),
+            "p95": ms(_percentile(latencies, 95)),
+            "p99": ms(_percentile(latencies, 99)),
+            "mean": ms(statistics.fmean(latencies)),
+            "max": ms(max(latencies)),
+        } if latencies else {},
+        "llm_calls_per_request": per_request("calls"),
+        "prompt_tokens_per_request": per_request("prompt_tokens"),
+        "completion_tokens_per_request": per_request("completion_tokens"),
+        "cost_usd_per_request": per_request("cost_usd", 6),
+        "cache": dict(cache),
+        "simulated_latency_ms": {
+            "llm": args.llm_latency_ms, "search": args.search_latency_ms, "embed": args.embed_latency_ms,
+        },
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    latency = report["latency_ms"]
+    print(f"mode={report['mode']} requests={report['requests']} concurrency={report['concurrency']} "
+          f"completed={report['completed']} errors={report['errors'] or 0}")
+    print(f"throughput   {report['rps']} req/s over {report['wall_s']} s")
+    if latency:
+        print(f"latency ms   p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} "
+              f"mean={latency['mean']} max={latency['max']}")
+    print(f"per request  llm_calls={report['llm_calls_per_request']} "
+          f"prompt_tokens={report['prompt_tokens_per_request']} "
+          f"completion_tokens={report['completion_tokens_per_request']} "
+          f"est_cost_usd={report['cost_usd_per_request']}")
+    if report["cache"]:
+        print("cache        " + " ".join(f"{k}={v}" for k, v in sorted(report["cache"].items())))
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="mas-bench-") as workdir:
+        _configure_environment(args, workdir)
+        _install_fakes(args)
+
+        async def session() -> dict[str, Any]:
+            from app.core.checkpoints import run_checkpointer
+
+            try:
+                await _seed_knowledge_base(args.documents)
+                return await _drive(args)
+            finally:
+                await run_checkpointer.aclose()
+
+        report = asyncio.run(session())
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,9 @@ Entry point: run with `uvicorn main:app --reload`
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -13,14 +15,28 @@ from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import router
+from app.core.checkpoints import run_checkpointer
 from app.core.config import settings
+from app.core.jobs import job_workers
+from app.core.llm import aclose_clients
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_workers.start()
+    yield
+    await asyncio.to_thread(job_workers.stop)
+    await aclose_clients()
+    await run_checkpointer.aclose()
+
+
 app = FastAPI(
     title="Enterprise MAS",
     description="Multi-Agent System with LangGraph for Enterprise Applications",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(